@@ -0,0 +1,117 @@
+"""Replays a large local Kafka topic through the ETL's rate control.
+
+Fills a benchmark topic with --records synthetic json_dataset records (unless --skip-produce),
+then streams it back with a simulated per-record processing cost, either with a fixed
+maxOffsetsPerTrigger or with the adaptive controller of the ETL. Prints the batch sizes,
+the batch durations and the total replay time.
+
+python benchmarks/backfill_replay.py --records 500000 --max-offsets 0           # one giant batch
+python benchmarks/backfill_replay.py --records 500000 --max-offsets 2000
+python benchmarks/backfill_replay.py --records 500000 --max-offsets 200 --adaptive
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ingest_cv.cv_spark_pipeline.cv_spark_ingestion import Lane, RateConfig, run_lanes
+from ingest_cv.cv_spark_pipeline.trace_report import percentile
+
+TOPIC = "etl_replay_benchmark"
+BOOTSTRAP = "localhost:9092"
+
+
+def produce(records):
+    from confluent_kafka import Producer
+    p = Producer({"bootstrap.servers": BOOTSTRAP, "linger.ms": 50})
+    for i in range(records):
+        payload = {"id": f"A{i}", "raw_data": json.dumps({"title": f"record {i}"}),
+                   "source": "json_dataset", "type": "jsonl", "category": "cv"}
+        p.produce(TOPIC, value=json.dumps(payload).encode("utf-8"))
+        if i % 10000 == 0:
+            p.poll(0)
+    p.flush()
+    print(f"{records} records produced to {TOPIC}")
+
+
+def replay(records, max_offsets, adaptive, cost_ms, trigger, cores):
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.master(f"local[{cores}]").appName("backfill_replay_benchmark") \
+        .config("spark.jars.packages", "org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0") \
+        .getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+    checkpoint = tempfile.mkdtemp(prefix="backfill_replay_")
+
+    def simulate(batches):
+        # the parsing cost of a record, paid once per Arrow batch
+        for pdf in batches:
+            time.sleep(cost_ms / 1000 * len(pdf))
+            yield pdf
+
+    def start_lane(lane, limit):
+        reader = spark.readStream.format("kafka").option("kafka.bootstrap.servers", BOOTSTRAP) \
+            .option("subscribe", TOPIC).option("startingOffsets", "earliest")
+        if limit:
+            reader = reader.option("maxOffsetsPerTrigger", str(limit))
+        df = reader.load().selectExpr("CAST(value AS STRING) AS value")
+        return df.writeStream \
+            .foreachBatch(lambda batch_df, batch_id: batch_df.mapInPandas(simulate, "value STRING")
+                          .write.format("noop").mode("overwrite").save()) \
+            .option("checkpointLocation", checkpoint) \
+            .trigger(processingTime=trigger) \
+            .start()
+
+    batches = []
+    seen = set()
+
+    def should_stop(queries):
+        # collects every batch reported since the last look, the query keeps a short history
+        for query in queries.values():
+            for progress in query.recentProgress:
+                if progress["batchId"] not in seen and progress["numInputRows"] > 0:
+                    seen.add(progress["batchId"])
+                    batches.append((progress["numInputRows"], progress["durationMs"].get("triggerExecution", 0)))
+                    print(f"batch {progress['batchId']:>5}: {progress['numInputRows']:>8} rows "
+                          f"{batches[-1][1]:>8} ms")
+        return sum(rows for rows, _ in batches) >= records
+
+    lane = Lane("replay", trigger, weight=1, min_share=0, max_offsets=max_offsets)
+    start = time.time()
+    try:
+        run_lanes([lane], start_lane, RateConfig(adaptive=adaptive, interval=1.0), should_stop)
+    finally:
+        spark.stop()
+        shutil.rmtree(checkpoint, ignore_errors=True)
+    elapsed = time.time() - start
+
+    durations = sorted(ms for _, ms in batches)
+    sizes = [rows for rows, _ in batches]
+    print(f"\nmaxOffsetsPerTrigger={max_offsets or 'unlimited'} adaptive={adaptive}: "
+          f"{sum(sizes)} rows in {len(batches)} batches, {elapsed:.1f}s")
+    if batches:
+        print(f"rows per batch  max={max(sizes)}  mean={sum(sizes) / len(sizes):.0f}")
+        print("batch ms  " + "  ".join(f"p{q}={percentile(durations, q)}" for q in (50, 95, 99))
+              + f"  max={durations[-1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=500_000)
+    parser.add_argument("--skip-produce", action="store_true", help="replay the records already in the topic")
+    parser.add_argument("--max-offsets", type=int, default=2000, help="0 = unlimited")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--cost-ms", type=float, default=1.0, help="simulated processing time per record")
+    parser.add_argument("--trigger", default="10 seconds")
+    parser.add_argument("--cores", type=int, default=4)
+    args = parser.parse_args()
+    if not args.skip_produce:
+        produce(args.records)
+    replay(args.records, args.max_offsets, args.adaptive, args.cost_ms, args.trigger, args.cores)
@@ -0,0 +1,87 @@
+"""Dedup state size and micro-batch latency of the streaming ETL.
+
+Feeds the rate source through the same deduplication as run_spark_etl, with a share of
+repeated hashes, until --records rows went through. Prints the state rows, the state
+memory and the batch durations, for the unbounded dropDuplicates or the watermark.
+
+python benchmarks/dedup_state.py [--records 1000000] [--mode watermark|unbounded] [--provider rocksdb|hdfs]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ingest_cv.cv_spark_pipeline.cv_spark_ingestion import STATE_STORE_CONF, deduplicate
+from ingest_cv.cv_spark_pipeline.trace_report import percentile
+
+
+def run(records, rows_per_second, mode, provider, watermark, duplicate_every, cores):
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, sha2
+
+    builder = SparkSession.builder.master(f"local[{cores}]").appName("dedup_state_benchmark") \
+        .config("spark.sql.shuffle.partitions", str(cores))
+    if provider == "rocksdb":
+        for key, value in STATE_STORE_CONF.items():
+            builder = builder.config(key, value)
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    # every duplicate_every-th row repeats the hash of a recent one, like a re-sent CV
+    stream = spark.readStream.format("rate").option("rowsPerSecond", rows_per_second).load() \
+        .withColumn("content_hash", sha2(
+            (col("value") - (col("value") % duplicate_every == 0).cast("long") * 7).cast("string"), 256))
+    if mode == "watermark":
+        unique = deduplicate(stream, watermark)
+    else:
+        unique = stream.dropDuplicates(["content_hash"])
+
+    checkpoint = tempfile.mkdtemp(prefix="dedup_state_")
+    query = unique.writeStream.format("noop").option("checkpointLocation", checkpoint) \
+        .trigger(processingTime="2 seconds").start()
+
+    durations, seen_batches, total_rows, state = [], set(), 0, {}
+    print(f"{'batch':>6} {'input rows':>12} {'total rows':>12} {'state rows':>12} {'state MB':>10} {'batch ms':>10}")
+    try:
+        while total_rows < records:
+            time.sleep(1)
+            progress = query.lastProgress
+            if not progress or progress["batchId"] in seen_batches:
+                continue
+            seen_batches.add(progress["batchId"])
+            total_rows += progress["numInputRows"]
+            batch_ms = progress["durationMs"].get("triggerExecution", 0)
+            durations.append(batch_ms)
+            state = progress["stateOperators"][0] if progress["stateOperators"] else {}
+            print(f"{progress['batchId']:>6} {progress['numInputRows']:>12} {total_rows:>12} "
+                  f"{state.get('numRowsTotal', 0):>12} {state.get('memoryUsedBytes', 0) / 2**20:>10.1f} {batch_ms:>10}")
+    finally:
+        query.stop()
+        spark.stop()
+        shutil.rmtree(checkpoint, ignore_errors=True)
+
+    durations.sort()
+    print(f"\n{mode} / {provider}: {total_rows} rows in {len(durations)} batches, "
+          f"final state {state.get('numRowsTotal', 0)} rows, {state.get('memoryUsedBytes', 0) / 2**20:.1f} MB")
+    print("batch ms  " + "  ".join(f"p{q}={percentile(durations, q)}" for q in (50, 95, 99)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--rows-per-second", type=int, default=20_000)
+    parser.add_argument("--mode", choices=("watermark", "unbounded"), default="watermark")
+    parser.add_argument("--provider", choices=("rocksdb", "hdfs"), default="rocksdb")
+    parser.add_argument("--watermark", default="30 seconds",
+                        help="shorter than the ETL's so that expiry shows within the run")
+    parser.add_argument("--duplicate-every", type=int, default=10)
+    parser.add_argument("--cores", type=int, default=4)
+    args = parser.parse_args()
+    run(args.records, args.rows_per_second, args.mode, args.provider, args.watermark,
+        args.duplicate_every, args.cores)
@@ -0,0 +1,68 @@
+"""Import-time guard for the entry points.
+
+Runs `python -X importtime -c "import <module>"` for every entry point, fails if one of
+the heavy dependencies is imported at module level and prints the slowest imports.
+
+python benchmarks/import_time.py [--budget-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ENTRY_POINTS = [
+    "run",
+    "prepare_cv_pipeline",
+    "faiss_matching",
+    "run_encoder",
+    "ingest_cv.cv_spark_pipeline.cv_spark_producer",
+    "ingest_cv.cv_spark_pipeline.cv_spark_ingestion",
+    "ingest_cv.cv_spark_pipeline.cv_spark_consumer",
+    "ingest_cv.cv_spark_pipeline.pipeline_supervisor",
+]
+# top-level packages that must only be imported inside the commands that need them
+HEAVY = ("torch", "transformers", "gliner", "pyspark", "faiss", "confluent_kafka",
+         "sentence_transformers", "huggingface_hub")
+
+
+def import_profile(module):
+    """Returns [(self_us, cumulative_us, name)] as reported by -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def check(module, budget_ms, top=5):
+    rows = import_profile(module)
+    # the imported module itself is the last line, its cumulative time is the total
+    total_ms = rows[-1][1] / 1000 if rows else 0.0
+    heavy = sorted({name.strip().split(".")[0] for _, _, name in rows} & set(HEAVY))
+    ok = not heavy and total_ms <= budget_ms
+    print(f"{'OK  ' if ok else 'FAIL'} {module}: {total_ms:.0f} ms")
+    if heavy:
+        print(f"     heavy imports at module level: {', '.join(heavy)}")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[0], reverse=True)[:top]:
+        print(f"     {self_us / 1000:8.1f} ms self  {cumulative_us / 1000:8.1f} ms cumulative  {name.strip()}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="maximum cumulative import time of a single entry point")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+    results = [check(module, args.budget_ms) for module in args.modules]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,118 @@
+"""Parsing throughput of the NLP CV parser for a matrix of workers x torch threads.
+
+Each cell starts --workers fresh processes, as Spark's local[N] Python workers would, sets
+their torch threads with model_registry.thread_env / configure_threads, loads the parser
+once per process and then times parse_batch over the same CV texts, in chunks of the ETL's
+Arrow batch size. Cells where workers x threads exceeds the cores are marked oversubscribed.
+
+python benchmarks/thread_matrix.py [--input cvs_dir_or_file.txt] [--docs 512] [--workers 1,2,4] [--threads 1,2,4,0]
+(a thread count of 0 = cores / workers, the ETL's default)
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INGEST_DIR = os.path.join(PROJECT_ROOT, "ingest_cv")
+for path in (PROJECT_ROOT, INGEST_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from cv_processing.model_registry import thread_env, threads_per_worker
+
+CHUNK = 64      # cv_spark_ingestion.ARROW_BATCH_ROWS
+
+SAMPLE_CV = """John Doe
+john.doe@example.com | +33 6 12 34 56 78 | Paris, France
+
+EXPERIENCE
+Senior Data Engineer - Acme Corp (2019 - 2024)
+Built streaming pipelines with Spark and Kafka, led a team of four engineers.
+Data Engineer - Globex (2016 - 2019)
+Designed the data warehouse and the ETL jobs in Python and SQL.
+
+EDUCATION
+MSc Computer Science - Universite Paris-Saclay (2014 - 2016)
+
+SKILLS
+Python, Spark, Kafka, SQL, Docker, Kubernetes, Airflow
+
+CERTIFICATIONS
+AWS Certified Data Analytics - 2021
+"""
+
+
+def load_texts(path, docs):
+    """docs CV texts from a directory of .txt files, a text file (CVs separated by two empty
+    lines) or the built-in sample."""
+    texts = []
+    if path and os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".txt"):
+                with open(os.path.join(path, name), encoding="utf-8") as f:
+                    texts.append(f.read())
+    elif path:
+        with open(path, encoding="utf-8") as f:
+            texts = [block for block in f.read().split("\n\n\n") if block.strip()]
+    if not texts:
+        texts = [SAMPLE_CV]
+    return [texts[i % len(texts)] for i in range(docs)]
+
+
+def _init_worker(threads):
+    # runs before torch is imported in this process: OpenMP/MKL pick the environment up
+    os.environ.update(thread_env(threads))
+    from cv_processing.model_registry import get_parser
+    get_parser("nlp").parse_batch([SAMPLE_CV])   # loads the models and warms them up
+
+def _parse(texts):
+    from cv_processing.model_registry import get_parser
+    get_parser("nlp").parse_batch(texts)
+    return len(texts)
+
+
+def run_cell(texts, workers, threads, chunk):
+    chunks = [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+    # spawn: every worker is a fresh interpreter, like a Python worker of the ETL
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        # one task per worker, so that every initializer has finished before the clock starts
+        pool.map(time.sleep, [0.5] * workers, chunksize=1)
+        start = time.time()
+        done = sum(pool.imap_unordered(_parse, chunks))
+        elapsed = time.time() - start
+    return done, elapsed
+
+
+def main(input_path, docs, workers_list, threads_list, chunk):
+    cores = os.cpu_count() or 1
+    texts = load_texts(input_path, docs)
+    print(f"{docs} CVs, {cores} cores, chunks of {chunk}\n")
+    print(f"{'workers':>8} {'threads':>8} {'docs/s':>10} {'ms/doc':>10} {'seconds':>10}")
+    results = dict()
+    for workers in workers_list:
+        for threads in threads_list:
+            threads = threads or threads_per_worker(workers, cores)
+            if (workers, threads) in results:
+                continue
+            done, elapsed = run_cell(texts, workers, threads, chunk)
+            results[workers, threads] = done / elapsed
+            flag = "  oversubscribed" if workers * threads > cores else ""
+            print(f"{workers:>8} {threads:>8} {done / elapsed:>10.2f} {elapsed * 1000 / done:>10.1f} "
+                  f"{elapsed:>10.1f}{flag}")
+    (workers, threads), rate = max(results.items(), key=lambda item: item[1])
+    print(f"\nbest: {workers} workers x {threads} threads, {rate:.2f} docs/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", default=None, help="directory of .txt CVs or a text file of CVs")
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", default="1,2,4,0")
+    parser.add_argument("--chunk", type=int, default=CHUNK)
+    args = parser.parse_args()
+    main(args.input, args.docs, [int(w) for w in args.workers.split(",")],
+         [int(t) for t in args.threads.split(",")], args.chunk)
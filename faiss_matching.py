@@ -1,21 +1,11 @@
-import faiss
 import numpy as np
 import pandas as pd
+from ingest_cv.cv_spark_pipeline.pipeline_trace import trace_stage
 
 # HERE: LOOKING TO MATCH CV WITH JOBS
 CV_QUERY_PATH = "embeddings/cv_query_embedding.parquet"
 JOB_PASSAGE_PATH = "embeddings/job_embeddings_passage.parquet"
 
- 
-df_job_passage = pd.read_parquet(JOB_PASSAGE_PATH)
-df_cv_query = pd.read_parquet(CV_QUERY_PATH)
-cv_query_lookup = df_cv_query.set_index('embedding_text')['embedding'].to_dict()
-job_passage_lookup = df_job_passage.set_index('embedding_text')['embedding'].to_dict()
-cv_id_to_text_query = df_cv_query.set_index('cv_id')['embedding_text'].to_dict()
-job_id_to_text_passage = df_job_passage.set_index('job_id')['embedding_text'].to_dict()
-
-job_dim = len(df_job_passage["embedding"][0])
-
 # HERE: LOOKING TO MATCH JOB WITH CVS
 
 # CV_PASSAGE_PATH = "training_embeddings/cv_embeddings_passage.parquet"
@@ -23,26 +13,59 @@ job_dim = len(df_job_passage["embedding"][0])
 
 CV_PASSAGE_PATH = CV_QUERY_PATH
 JOB_QUERY_PATH = JOB_PASSAGE_PATH
-df_job_query = pd.read_parquet(JOB_QUERY_PATH)
-df_cv_passage= pd.read_parquet(CV_PASSAGE_PATH)
-cv_passage_lookup = df_cv_passage.set_index('embedding_text')['embedding'].to_dict()
-job_query_lookup = df_job_query.set_index('embedding_text')['embedding'].to_dict()
-cv_id_to_text_passage = df_cv_passage.set_index('cv_id')['embedding_text'].to_dict()
-job_id_to_text_query = df_job_query.set_index('job_id')['embedding_text'].to_dict()
 
-cv_dim = len(df_cv_passage["embedding"][0]) 
+_loaded = False
+
+def load_stores():
+    """Reads the embedding stores on first use instead of at import time."""
+    global _loaded, df_job_passage, df_cv_query, cv_query_lookup, job_passage_lookup
+    global cv_id_to_text_query, job_id_to_text_passage, job_dim
+    global df_job_query, df_cv_passage, cv_passage_lookup, job_query_lookup
+    global cv_id_to_text_passage, job_id_to_text_query, cv_dim
+    if _loaded:
+        return
+    df_job_passage = pd.read_parquet(JOB_PASSAGE_PATH)
+    df_cv_query = pd.read_parquet(CV_QUERY_PATH)
+    cv_query_lookup = df_cv_query.set_index('embedding_text')['embedding'].to_dict()
+    job_passage_lookup = df_job_passage.set_index('embedding_text')['embedding'].to_dict()
+    cv_id_to_text_query = df_cv_query.set_index('cv_id')['embedding_text'].to_dict()
+    job_id_to_text_passage = df_job_passage.set_index('job_id')['embedding_text'].to_dict()
+
+    job_dim = len(df_job_passage["embedding"][0])
+
+    df_job_query = pd.read_parquet(JOB_QUERY_PATH)
+    df_cv_passage= pd.read_parquet(CV_PASSAGE_PATH)
+    cv_passage_lookup = df_cv_passage.set_index('embedding_text')['embedding'].to_dict()
+    job_query_lookup = df_job_query.set_index('embedding_text')['embedding'].to_dict()
+    cv_id_to_text_passage = df_cv_passage.set_index('cv_id')['embedding_text'].to_dict()
+    job_id_to_text_query = df_job_query.set_index('job_id')['embedding_text'].to_dict()
+
+    cv_dim = len(df_cv_passage["embedding"][0]) 
+    _loaded = True
+
+
+def build_index(matrix, ids):
+    """Inner-product index keyed by the numeric part of the ids (A12 -> 12)."""
+    import faiss
+    matrix = np.ascontiguousarray(matrix, dtype='float32')
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(matrix.shape[1]))
+    index.add_with_ids(matrix, np.asarray(ids, dtype="int64"))
+    return index
 
 
 
 def matching(new_query, k = 10, search_jobs_for_cv = True):
+    with trace_stage("matching", k=k, search_jobs_for_cv=search_jobs_for_cv):
+        return _matching(new_query, k, search_jobs_for_cv)
+
+def _matching(new_query, k, search_jobs_for_cv):
+    load_stores()
     if search_jobs_for_cv == True:
         print("Looking to match your cvs with our dataset of jobs...")
         # we query with cv to find jobs
         job_matrix = np.stack(df_job_passage["embedding"].tolist()).astype('float32')
         job_ids = df_job_passage["job_id"].str[1:].astype("int64")
-        index_job = faiss.IndexFlatIP(job_dim)
-        index_job = faiss.IndexIDMap(index_job)
-        index_job.add_with_ids(job_matrix, job_ids)
+        index_job = build_index(job_matrix, job_ids)
         if isinstance(new_query, str):
             new_query = [new_query]
         embeddings = [cv_query_lookup[text] for text in new_query]
@@ -72,9 +95,7 @@ def matching(new_query, k = 10, search_jobs_for_cv = True):
         print("Looking to match your jobs with our dataset of cvs...")
         cv_matrix = np.stack(df_cv_passage["embedding"].tolist()).astype('float32')
         cv_ids = df_cv_passage["cv_id"].str[1:].astype("int64")
-        index_cv = faiss.IndexFlatIP(cv_dim)
-        index_cv = faiss.IndexIDMap(index_cv)
-        index_cv.add_with_ids(cv_matrix, cv_ids)
+        index_cv = build_index(cv_matrix, cv_ids)
         if isinstance(new_query, str):
             new_query = [new_query]
         embeddings = [job_query_lookup[text] for text in new_query]
@@ -105,6 +126,7 @@ def matching(new_query, k = 10, search_jobs_for_cv = True):
 
 
 if __name__ == "__main__":
+    load_stores()
     # looking for jobs to match my cv
     print(matching(df_cv_query["embedding_text"].iloc[0], k = 1))
 
@@ -0,0 +1,130 @@
+import os, sys
+script_path = os.path.abspath(__file__)
+project_root = os.path.dirname(script_path)
+for path in (project_root, os.path.join(project_root, "ingest_cv")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from cv_processing.document_router import route_document, output_text
+from faiss_matching import CV_QUERY_PATH, JOB_PASSAGE_PATH
+from ingest_cv.cv_spark_pipeline.cv_spark_producer import (
+    yield_jsonl_records, yield_json_records, yield_pdf_record, yield_text_record, yield_csv_records
+)
+
+# --- STORES ---
+TEXT_STORES = {"cv": "cv_datasets/cv_text", "job": "job_datasets/job_text"}
+SCHEMA_STORES = {"cv": "cv_datasets/cv_schema", "job": "job_datasets/job_schema"}
+INFO_STORE = "cv_datasets/cv_info"
+# the embedding stores the indexes are built from at startup: (path, id column)
+EMBEDDING_STORES = {"cv": (CV_QUERY_PATH, "cv_id"), "job": (JOB_PASSAGE_PATH, "job_id")}
+
+
+def read_records(file_info):
+    """Same file handlers used by the Kafka producer."""
+    f_path = file_info['path']
+    f_type = file_info['type']
+    if f_type == 'jsonl': return yield_jsonl_records(f_path)
+    elif f_type == 'json': return yield_json_records(f_path)
+    elif f_type == 'pdf': return yield_pdf_record(f_path)
+    elif f_type == 'txt': return yield_text_record(f_path)
+    elif f_type == "csv": return yield_csv_records(f_path, column_name=file_info.get('col', 'Resume_str'))
+    raise ValueError(f"Unsupported file type: {f_type}")
+
+
+class StoreWriter:
+    """Appends processed documents to the parquet/json stores on a background thread.
+    A single worker keeps the writes ordered."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store_writer")
+        self.pending = []
+
+    def submit(self, category, result, embedding=None):
+        """embedding: (vector, embedding_text) of the document, as added to the warm index."""
+        self.pending.append(self.executor.submit(self._write, category, result, embedding))
+
+    @staticmethod
+    def _replace(path, write):
+        # written next to the store, then renamed over it: a crash never leaves it half-written
+        tmp_path = path + ".tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _append_parquet(cls, path, row):
+        df_new = pd.DataFrame([row])
+        if os.path.exists(path):
+            df_new = pd.concat([pd.read_parquet(path), df_new], ignore_index=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cls._replace(path, lambda tmp: df_new.to_parquet(tmp))
+
+    def _write(self, category, result, embedding=None):
+        doc_id = result["id"]
+        self._append_parquet(TEXT_STORES[category], {"id": doc_id, "text": output_text(result)})
+        if category == "cv" and result.get("personal_info"):
+            self._append_parquet(INFO_STORE, json.loads(result["personal_info"]))
+
+        if result.get("schema_json"):
+            schema_path = SCHEMA_STORES[category]
+            schemas = []
+            if os.path.exists(schema_path):
+                with open(schema_path, "r") as f:
+                    schemas = json.load(f)
+            schemas.append(json.loads(result["schema_json"]))
+            def dump(tmp):
+                with open(tmp, "w") as f:
+                    json.dump(schemas, f)
+            self._replace(schema_path, dump)
+
+        # the vector too, or the document leaves the index at the next restart
+        if embedding is not None:
+            vector, embedding_text = embedding
+            path, id_column = EMBEDDING_STORES[category]
+            self._append_parquet(path, {id_column: doc_id, "embedding": [float(x) for x in vector],
+                                        "embedding_text": embedding_text})
+        print(f"[{doc_id}] written to the {category} stores")
+
+    def flush(self):
+        """Waits for every pending write, raising the first error."""
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
+
+
+def fast_ingest_and_match(service, file_info, k=10, writer=None):
+    """Parse -> format -> encode -> match in-process, without Kafka or Spark.
+    The stores are updated asynchronously by `writer` once the matches are ready."""
+    category = file_info.get('category', 'cv')
+    results = []
+    for raw_content in read_records(file_info):
+        if not isinstance(raw_content, str):
+            raw_content = json.dumps(raw_content)
+        # the id is assigned by the service once the document is parsed
+        result = route_document("pending", file_info['source'], raw_content, file_info['type'], category)
+        if result["error"]:
+            print(f"Skipping record from {file_info['path']}: {result['error']}")
+            continue
+
+        schema = json.loads(result["schema_json"])
+        doc_id = service.ingest(output_text(result), category, schema)
+        schema["id"] = doc_id
+        result["id"] = doc_id
+        result["schema_json"] = json.dumps(schema)
+        if category == "cv":
+            info = json.loads(result["personal_info"])
+            info["id"] = doc_id
+            result["personal_info"] = json.dumps(info)
+
+        matches = service.match_id(doc_id, k)
+        if writer is not None:
+            writer.submit(category, result, service.embedding_of(category, doc_id))
+        results.append(matches)
+    return results
@@ -2,6 +2,23 @@ import re
 import json
 import pandas as pd
 
+# integer seniority of each bucket, 0 when it is unknown
+SENIORITY_LEVELS = {"internship level": 1, "junior level": 2, "mid-level": 3, "senior level": 4, "principal level": 5}
+UNKNOWN_LEVEL = 0
+
+def experience_level(exp_val):
+    """Seniority bucket for a number of years of experience."""
+    level = "principal level"
+    if exp_val == 0: level = "internship level"
+    elif exp_val < 3: level = "junior level"
+    elif exp_val < 6: level = "mid-level"
+    elif exp_val < 8: level = "senior level"
+    return level
+
+def seniority_level(exp_val):
+    """Integer seniority (1-5) for a number of years of experience."""
+    return SENIORITY_LEVELS[experience_level(exp_val)]
+
 def cv_formatter(resume):
     diz = dict()
     parts = ["I am a"] 
@@ -18,11 +35,7 @@ def cv_formatter(resume):
     if exp is not None:
         try:
             exp_val = int(exp)
-            level = "principal level"
-            if exp_val == 0: level = "internship level"
-            elif exp_val < 3: level = "junior level"
-            elif exp_val < 6: level = "mid-level"
-            elif exp_val < 8: level = "senior level"
+            level = experience_level(exp_val)
             parts.append(f"with {exp_val} years of experience ({level}).")
         except ValueError:
             pass
@@ -0,0 +1,153 @@
+import json
+import time
+
+
+def select_parser(source, data_type, category=None):
+    """Name of the parser a document is routed to, None when there is none.
+    A malformed payload may come with null fields: it must become an error row, not fail the batch."""
+    data_type = data_type or ""
+    if category == "job":
+        return "job"
+    if source == "new_texts" or "txt" in data_type:
+        return "nlp"
+    elif source == "linkedin_pdf" or "pdf" in data_type:
+        return "linkedin_pdf"
+    elif source == "string_dataset":
+        return "dataset"
+    elif source == "json_dataset":
+        return "json"
+    return None
+
+
+def _error_result(doc_id, source, is_job, error):
+    return {"id": doc_id, "source": source, "is_job": is_job, "schema_json": "{}",
+            "text_output": "{}", "personal_info": "{}", "error": error}
+
+def _cv_result(doc_id, source, schema_data):
+    """Formats a parsed CV, or the failure of its parser."""
+    from cv_processing.cv_formatting import cv_formatter
+
+    if schema_data and "Error" not in schema_data:
+        text_out, pers_info = cv_formatter(schema_data)
+
+        # Add ID to dictionaries for consistency
+        schema_data["id"] = doc_id
+        pers_info["id"] = doc_id
+
+        return {
+            "id": doc_id, "source": source, "is_job": "False",
+            "schema_json": json.dumps(schema_data),
+            "text_output": json.dumps({"text": text_out, "id": doc_id}),
+            "personal_info": json.dumps(pers_info),
+            "error": None
+        }
+    return _error_result(doc_id, source, "False", "Parser failed")
+
+
+def route_document(doc_id, source, raw_data, data_type, category=None):
+    """Router: Processes Jobs if 'category' is job, otherwise processes CVs.
+    Shared by the Spark ETL and the in-process fast path."""
+    # Job Imports
+    from cleaning_logic.clean_postings import schematize_posting
+    from job_processing.job_formatting import job_text
+
+    # CV Imports
+    from cv_processing.model_registry import get_parser
+    from cv_processing.linkedin_pdf_processing import extract_cv_data
+    from cv_processing.json_dataset_processing import reprocess_json
+
+    parser = select_parser(source, data_type, category)
+    try:
+        # --- PATH A: JOB PROCESSING ---
+        if parser == "job":
+            print(f"[{doc_id}] Processing as JOB")
+            job_dict = json.loads(raw_data) if isinstance(raw_data, str) else raw_data
+
+            # Step 1: Schematize
+            schema_data = schematize_posting(job_dict)
+            # Step 2: Extract Text
+            text_out = job_text(schema_data)
+
+            return {
+                "id": doc_id, "source": source, "is_job": "True",
+                "schema_json": json.dumps(schema_data),
+                "text_output": json.dumps({"text": text_out, "id": doc_id}),
+                "personal_info": "{}", "error": None
+            }
+
+        # --- PATH B: CV PROCESSING ---
+        else:
+            print(f"[{doc_id}] Processing as CV")
+            schema_data = None
+            if parser == "nlp":
+                schema_data = get_parser(parser).parse(raw_data)
+            elif parser == "linkedin_pdf":
+                schema_data = extract_cv_data(raw_data)
+            elif parser == "dataset":
+                schema_data = get_parser(parser).parse(raw_data)
+            elif parser == "json":
+                schema_data = reprocess_json(json.loads(raw_data) if isinstance(raw_data, str) else raw_data)
+            return _cv_result(doc_id, source, schema_data)
+
+    except Exception as e:
+        return _error_result(doc_id, source, "error", str(e))
+
+
+# parsers with a parse_batch entry point, their documents are parsed together
+BATCH_PARSERS = ("nlp", "dataset")
+
+def _add_timing(timings, parser, rows, start, spans=None, indexes=None):
+    end = time.time()
+    if timings is not None:
+        done_rows, seconds = timings.get(parser, (0, 0.0))
+        timings[parser] = (done_rows + rows, seconds + end - start)
+    if spans is not None:
+        spans.append((parser, indexes, start, end))
+
+def route_documents(docs, timings=None, spans=None):
+    """Routes a list of documents (dicts with id, source, raw_data, type, category).
+    CVs of a model-backed parser go through its parse_batch, the others through route_document.
+    Results keep the order of the input. If given, timings is filled with parser -> (rows, seconds)
+    and spans with one (parser, document indexes, start, end) per parser call."""
+    from cv_processing.model_registry import get_parser
+
+    results = [None] * len(docs)
+    groups = dict()
+    for i, doc in enumerate(docs):
+        parser = select_parser(doc["source"], doc["type"], doc.get("category"))
+        if parser in BATCH_PARSERS:
+            groups.setdefault(parser, []).append(i)
+        else:
+            start = time.time()
+            results[i] = route_document(doc["id"], doc["source"], doc["raw_data"], doc["type"], doc.get("category"))
+            _add_timing(timings, parser, 1, start, spans, [i])
+
+    for parser, indexes in groups.items():
+        print(f"Processing {len(indexes)} CVs with the '{parser}' parser in one batch")
+        start = time.time()
+        try:
+            schemas = get_parser(parser).parse_batch([docs[i]["raw_data"] for i in indexes])
+        except Exception as e:
+            schemas = [None] * len(indexes)
+            error = str(e)
+        else:
+            error = None
+        for i, schema_data in zip(indexes, schemas):
+            doc = docs[i]
+            if error is not None:
+                results[i] = _error_result(doc["id"], doc["source"], "error", error)
+                continue
+            try:
+                results[i] = _cv_result(doc["id"], doc["source"], schema_data)
+            except Exception as e:
+                results[i] = _error_result(doc["id"], doc["source"], "error", str(e))
+        _add_timing(timings, parser, len(indexes), start, spans, indexes)
+    return results
+
+
+def output_text(result):
+    """Plain formatted text from a routed result (cv_formatter wraps it in a dict)."""
+    text = json.loads(result["text_output"]).get("text", "")
+    if isinstance(text, dict):
+        text = text.get("text", "")
+    return text
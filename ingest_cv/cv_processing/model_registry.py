@@ -0,0 +1,91 @@
+import os
+import threading
+
+# PARSER REGISTRY: one instance of each model-backed parser per Python worker
+# building a parser loads its models from disk, so it happens once and is reused by every row
+
+_parsers = dict()
+_lock = threading.Lock()
+_owner_pid = os.getpid()
+_threads_pid = None
+
+# --- THREADS ---
+# torch defaults to one intra-op thread per core in every process: N Python workers running
+# the models at once oversubscribe the CPU N times. The ETL exports these before its workers start.
+TORCH_THREADS_ENV = "CV_TORCH_THREADS"
+TORCH_INTEROP_ENV = "CV_TORCH_INTEROP_THREADS"
+
+
+def threads_per_worker(workers, cores=None):
+    """Intra-op threads of each of `workers` concurrent model processes sharing `cores`."""
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // max(1, workers))
+
+def thread_env(threads, interop_threads=1):
+    """Environment of the model processes; OpenMP/MKL read it when torch is imported."""
+    return {
+        TORCH_THREADS_ENV: str(threads),
+        TORCH_INTEROP_ENV: str(interop_threads),
+        "OMP_NUM_THREADS": str(threads),
+        "MKL_NUM_THREADS": str(threads),
+        # the fast tokenizers start their own pool, one per worker on top of torch's
+        "TOKENIZERS_PARALLELISM": "false",
+    }
+
+def configure_threads():
+    """Applies CV_TORCH_THREADS / CV_TORCH_INTEROP_THREADS to torch in this process, if set."""
+    global _threads_pid
+    if _threads_pid == os.getpid():
+        return
+    _threads_pid = os.getpid()
+    threads = int(os.environ.get(TORCH_THREADS_ENV, 0))
+    if not threads:
+        return
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(int(os.environ.get(TORCH_INTEROP_ENV, 1)))
+    except RuntimeError:
+        # only allowed before the first parallel operation of the process
+        pass
+    print(f"[model_registry] torch threads in process {_threads_pid}: "
+          f"{torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def _build_nlp():
+    from cv_processing.string_cvs_processing import CVParserNLP
+    return CVParserNLP()
+
+def _build_dataset():
+    from cv_processing.string_dataset_processing import CVParserDATASET
+    return CVParserDATASET()
+
+# route name (see document_router.select_parser) -> parser factory
+BUILDERS = {
+    "nlp": _build_nlp,
+    "dataset": _build_dataset,
+}
+
+
+def get_parser(name):
+    """Parser for a route ("nlp" or "dataset"), loaded on first use in this process."""
+    global _owner_pid
+    with _lock:
+        if os.getpid() != _owner_pid:
+            # forked child: the parent's instances are not reused across processes
+            _parsers.clear()
+            _owner_pid = os.getpid()
+        parser = _parsers.get(name)
+        if parser is None:
+            configure_threads()
+            print(f"[model_registry] loading the '{name}' parser in process {_owner_pid}")
+            parser = _parsers[name] = BUILDERS[name]()
+        return parser
+
+def preload(names=tuple(BUILDERS)):
+    """Loads the parsers ahead of the first row, e.g. when a worker starts."""
+    for name in names:
+        get_parser(name)
+
+def loaded_parsers():
+    return sorted(_parsers)
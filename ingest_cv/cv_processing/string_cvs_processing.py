@@ -49,6 +49,7 @@ class CVParserNLP:
         self.experience_labels = ["job title", "position", "company name", "organization", "employment date", "start date", "end date", "department", "location", "responsibility", "achievement"]
         self.education_labels = ["university", "college", "school name", "degree", "major", "field of study", "graduation date", "GPA", "academic achievement", "thesis title"]
         self.skills_labels = ["programming language", "framework", "tool", "software", "technical skill", "soft skill", "certification", "proficiency level"]
+        self.location_labels = ["city", "location", "address", "place"]
 
         print("Models loaded successfully")
 
@@ -106,7 +107,18 @@ class CVParserNLP:
             start += max_length - overlap
         return chunks, positions
 
-    def _extract_entities_for_section(self, text, section_type):
+    def _predict_chunks(self, chunks, labels):
+        """GLiNER predictions for many chunks, self.batch_size chunks per forward pass."""
+        batch_predict = getattr(self.extractor, "batch_predict_entities", None)
+        if batch_predict is None:
+            return [self.extractor.predict_entities(chunk, labels) for chunk in chunks]
+        predictions = []
+        for i in range(0, len(chunks), self.batch_size):
+            predictions.extend(batch_predict(chunks[i:i + self.batch_size], labels))
+        return predictions
+
+    def _extract_entities_for_sections(self, texts, section_type):
+        """Entities of the same section of many CVs, predicted together."""
         label_map = {
             "contact": self.contact_labels,
             "experience": self.experience_labels,
@@ -114,23 +126,30 @@ class CVParserNLP:
             "skills": self.skills_labels
         }
         labels = label_map.get(section_type, self.contact_labels)
-        chunks, positions = self._chunk_text(text)
-        all_entities = []
-        seen_entities = set()
-
-        for chunk, char_offset in zip(chunks, positions):
-            chunk_entities = self.extractor.predict_entities(chunk, labels)
+        owners, chunks, offsets = [], [], []
+        for i, text in enumerate(texts):
+            text_chunks, positions = self._chunk_text(text)
+            owners.extend([i] * len(text_chunks))
+            chunks.extend(text_chunks)
+            offsets.extend(positions)
+
+        all_entities = [[] for _ in texts]
+        seen_entities = [set() for _ in texts]
+        for owner, char_offset, chunk_entities in zip(owners, offsets, self._predict_chunks(chunks, labels)):
             for ent in chunk_entities:
                 ent['start'] += char_offset
                 ent['end'] += char_offset
                 ent['entity_group'] = ent['label'].upper().replace(" ", "_")
                 ent['word'] = ent['text']
                 entity_id = f"{ent['word']}_{ent['start']}_{ent['end']}"
-                if entity_id not in seen_entities:
-                    seen_entities.add(entity_id)
-                    all_entities.append(ent)
+                if entity_id not in seen_entities[owner]:
+                    seen_entities[owner].add(entity_id)
+                    all_entities[owner].append(ent)
         return all_entities
 
+    def _extract_entities_for_section(self, text, section_type):
+        return self._extract_entities_for_sections([text], section_type)[0]
+
     def parse(self, text):
         if not isinstance(text, str):
             text = str(text)
@@ -138,38 +157,88 @@ class CVParserNLP:
             return self._empty_result()
         return self._parse_single(text)
 
-    def _parse_single(self, text, all_entities=None):
-        sections = self._process_cv(text)
+    def _section_texts(self, text, sections):
+        """The text each entity pass reads: header, experience, education and skills (+ languages)."""
+        skills_text = sections.get("Skills", "")
+        if sections.get("Languages", ""):
+            skills_text += "\n" + sections["Languages"]
+        return {
+            "contact": sections.get("Header", text[:500]),
+            "experience": sections.get("Experience", ""),
+            "education": sections.get("Education", ""),
+            "skills": skills_text,
+        }
+
+    def _batch_entities(self, texts, sections):
+        """Every GLiNER pass of _parse_single for many CVs, each pass over the whole batch."""
+        section_texts = [self._section_texts(text, sec) for text, sec in zip(texts, sections)]
+        entities = [dict() for _ in texts]
+        for section_type in ("contact", "experience", "education", "skills"):
+            predicted = self._extract_entities_for_sections([t[section_type] for t in section_texts], section_type)
+            for doc_entities, section_entities in zip(entities, predicted):
+                doc_entities[section_type] = section_entities
+        # the location pass only runs on the headers the line patterns did not resolve
+        missing = [i for i, t in enumerate(section_texts) if not self._location_from_lines(t["contact"])]
+        predicted = self._predict_chunks([section_texts[i]["contact"][:500] for i in missing], self.location_labels)
+        for i, location_entities in zip(missing, predicted):
+            entities[i]["location"] = location_entities
+        return entities
+
+    def parse_batch(self, texts_list, batch_size=None):
+        """
+        Parse a list of CV texts, same output as parse() for each of them.
+        Each entity pass (contact, location, experience, education, skills) goes through
+        GLiNER once for the whole batch.
+        """
+        batch_size = batch_size or self.batch_size
+        results = []
+        for i in range(0, len(texts_list), batch_size):
+            batch_texts = ["" if t is None else str(t) for t in texts_list[i : i + batch_size]]
+            valid = [j for j, t in enumerate(batch_texts) if t.strip() and t != "nan"]
+            sections = {j: self._process_cv(batch_texts[j]) for j in valid}
+            entities = dict(zip(valid, self._batch_entities([batch_texts[j] for j in valid],
+                                                            [sections[j] for j in valid])))
+            for j, text in enumerate(batch_texts):
+                if j not in sections:
+                    results.append(self._empty_result())
+                    continue
+                try:
+                    results.append(self._parse_single(text, entities[j], sections[j]))
+                except Exception as e:
+                    print(f"Error processing CV in batch: {e}")
+                    results.append({"Error": str(e), "Raw": text[:100]})
+        return results
+
+    def _parse_single(self, text, entities=None, sections=None):
+        # entities: section type -> GLiNER entities, when already predicted in a batch
+        if sections is None:
+            sections = self._process_cv(text)
         print(f"DEBUG: Sections found: {list(sections.keys())}")
+        entities = entities or dict()
+        section_texts = self._section_texts(text, sections)
 
-        header_text = sections.get("Header", text[:500])
-        contact_info = self._extract_contact_info(header_text)
+        header_text = section_texts["contact"]
+        header_entities = entities.get("contact")
+        if header_entities is None:
+            header_entities = self._extract_entities_for_section(header_text, "contact")
+        contact_info = self._extract_contact_info(header_text, header_entities, entities.get("location"))
 
-        header_entities = self._extract_entities_for_section(header_text, "contact")
         professional_title = self._extract_professional_title(header_text, header_entities)
 
-        experience_section = sections.get("Experience", "")
-        jobs = self._process_experience(experience_section)
+        jobs = self._process_experience(section_texts["experience"], entities.get("experience"))
 
         if professional_title == "Professional" and jobs and jobs[0].get("title"):
             professional_title = jobs[0]["title"]
         professional_title = self._clean_field(professional_title)
 
-        education_section = sections.get("Education", "")
         certifications_section = sections.get("Certifications", "")
 
-        real_education = self._process_education_section(education_section)
+        real_education = self._process_education_section(section_texts["education"], entities.get("education"))
         certifications = self._process_certifications_section(certifications_section)
 
         combined_education = real_education + certifications
 
-        skills_section = sections.get("Skills", "")
-        languages_section = sections.get("Languages", "")
-        combined_skills_text = skills_section
-        if languages_section:
-            combined_skills_text += "\n" + languages_section
-
-        skills = self._process_skills(combined_skills_text)
+        skills = self._process_skills(section_texts["skills"], entities.get("skills"))
 
         if jobs and (jobs[0]["title"] == "Position" or not jobs[0]["title"]):
             jobs[0]["title"] = professional_title.capitalize()
@@ -264,11 +333,12 @@ class CVParserNLP:
 
         return certs
 
-    def _process_education_section(self, section_text):
+    def _process_education_section(self, section_text, edu_entities=None):
         if not section_text:
             return []
 
-        edu_entities = self._extract_entities_for_section(section_text, "education")
+        if edu_entities is None:
+            edu_entities = self._extract_entities_for_section(section_text, "education")
         date_matches = list(re.finditer(self.date_pattern, section_text))
         education_entries = []
 
@@ -343,8 +413,25 @@ class CVParserNLP:
 
         return education_entries
 
-    def _extract_contact_info(self, header_text):
-        contact_entities = self._extract_entities_for_section(header_text, "contact")
+    def _location_from_lines(self, header_text):
+        """A "City, Country" line of the header, "" when there is none."""
+        lines = [line.strip() for line in header_text.split('\n') if line.strip()]
+        bad_indicators = ['personal information', 'curriculum vitae', 'resume', 'contact', 'email', 'phone', 'www.', 'http', '@', 'name:']
+        loc_line_pattern = re.compile(r'^([A-Z][a-zA-Z\.\s-]+,\s*[A-Z][a-zA-Z\.\s-]+)$')
+
+        for line in lines:
+            line_lower = line.lower()
+            if any(ind in line_lower for ind in bad_indicators) or any(c.isdigit() for c in line):
+                continue
+            if loc_line_pattern.match(line):
+                if not any(x in line_lower for x in ['university', 'college', 'limited', 'gmbh', 'inc.', 'ltd']):
+                    return line
+        return ""
+
+    def _extract_contact_info(self, header_text, contact_entities=None, location_entities=None):
+        # location_entities: the location pass of the header, when already predicted in a batch
+        if contact_entities is None:
+            contact_entities = self._extract_entities_for_section(header_text, "contact")
         email_match = self.email_pattern.search(header_text)
         email = email_match.group(0) if email_match else ""
         for ent in contact_entities:
@@ -359,22 +446,12 @@ class CVParserNLP:
                 linkedin = ent['word']
                 break
 
-        location = ""
+        location = self._location_from_lines(header_text)
         lines = [line.strip() for line in header_text.split('\n') if line.strip()]
-        bad_indicators = ['personal information', 'curriculum vitae', 'resume', 'contact', 'email', 'phone', 'www.', 'http', '@', 'name:']
-        loc_line_pattern = re.compile(r'^([A-Z][a-zA-Z\.\s-]+,\s*[A-Z][a-zA-Z\.\s-]+)$')
-
-        for line in lines:
-            line_lower = line.lower()
-            if any(ind in line_lower for ind in bad_indicators) or any(c.isdigit() for c in line):
-                continue
-            if loc_line_pattern.match(line):
-                if not any(x in line_lower for x in ['university', 'college', 'limited', 'gmbh', 'inc.', 'ltd']):
-                    location = line
-                    break
 
         if not location:
-            location_entities = self.extractor.predict_entities(header_text[:500], ["city", "location", "address", "place"])
+            if location_entities is None:
+                location_entities = self.extractor.predict_entities(header_text[:500], self.location_labels)
             for ent in location_entities:
                 if ent['label'].lower() in ['city', 'location', 'place']:
                     potential_loc = ent['text'].strip()
@@ -511,11 +588,12 @@ class CVParserNLP:
                     continue
         return structured_cv
 
-    def _process_experience(self, section_text):
+    def _process_experience(self, section_text, exp_entities=None):
         if not section_text:
             return []
 
-        exp_entities = self._extract_entities_for_section(section_text, "experience")
+        if exp_entities is None:
+            exp_entities = self._extract_entities_for_section(section_text, "experience")
         date_matches = list(re.finditer(self.date_pattern, section_text))
         jobs = []
 
@@ -577,11 +655,12 @@ class CVParserNLP:
         return jobs
 
     # ### FIX: UPDATED SKILLS PROCESSING FOR SHORT WORDS AND NOISE ###
-    def _process_skills(self, section_text):
+    def _process_skills(self, section_text, skill_entities=None):
         if not section_text:
             return []
 
-        skill_entities = self._extract_entities_for_section(section_text, "skills")
+        if skill_entities is None:
+            skill_entities = self._extract_entities_for_section(section_text, "skills")
         skill_list = []
 
         # Whitelist for short skills (1-2 chars) that are usually valid
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# --- CONFIGURATION ---
+# content hash -> document id, shared by the producer and the ETL workers, survives checkpoints
+REGISTRY_FILE = os.environ.get(
+    "CV_REGISTRY_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_registry.sqlite")
+)
+
+SENT = "sent"               # produced to Kafka, not parsed yet
+PROCESSED = "processed"     # parsed by the ETL and written to the processed topics
+
+_LOOKUP_CHUNK = 500         # sqlite's limit on query parameters
+
+
+def content_hash(raw):
+    """sha256 of a record's content; dict records are hashed in a canonical form."""
+    if not isinstance(raw, str):
+        raw = json.dumps(raw, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ContentRegistry:
+    """Durable registry of the content already sent to or parsed by the pipeline."""
+
+    def __init__(self, path=REGISTRY_FILE):
+        # several ETL workers write concurrently: WAL and a generous busy timeout
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                content_hash TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                category TEXT,
+                status TEXT NOT NULL,
+                updated REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def lookup(self, hashes):
+        """{content_hash: (doc_id, status)} for the hashes already registered."""
+        hashes = list(dict.fromkeys(hashes))
+        found = dict()
+        for i in range(0, len(hashes), _LOOKUP_CHUNK):
+            chunk = hashes[i:i + _LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT content_hash, doc_id, status FROM documents "
+                f"WHERE content_hash IN ({','.join('?' * len(chunk))})", chunk)
+            for h, doc_id, status in rows:
+                found[h] = (doc_id, status)
+        return found
+
+    def register(self, h, doc_id, category):
+        """Records content sent under doc_id, a hash keeps its first id. Call commit() after."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO documents VALUES (?, ?, ?, ?, ?)",
+            (h, doc_id, category, SENT, time.time()))
+
+    def mark_processed(self, entries):
+        """entries: (content_hash, doc_id, category) of successfully parsed documents."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO documents VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(content_hash) DO UPDATE SET "
+            # the first id to be parsed keeps the content
+            "doc_id = CASE WHEN documents.status = 'processed' THEN documents.doc_id ELSE excluded.doc_id END, "
+            "status = excluded.status, updated = excluded.updated",
+            [(h, doc_id, category, PROCESSED, now) for h, doc_id, category in entries])
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+_registries = dict()
+
+def get_registry(path=REGISTRY_FILE):
+    """One connection per process (sqlite connections must not cross a fork)."""
+    key = (os.getpid(), path)
+    if key not in _registries:
+        _registries[key] = ContentRegistry(path)
+    return _registries[key]
@@ -1,13 +1,25 @@
 import json
 import time
 import os
+import sys
 import logging
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
-from confluent_kafka import Consumer, KafkaError
-from pyspark.sql import SparkSession
-from pyspark.sql.types import StructType, StructField, StringType, IntegerType
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+for path in (project_root, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from pipeline_trace import record_stage, record_wait
+from pipeline_metrics import FlushMetrics
+from pipeline_supervisor import touch_heartbeat, writer_id
+from scores.feature_store import DERIVE, write_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
 @dataclass
@@ -29,40 +41,48 @@ class Config:
 
 # --- SCHEMI SPARK ---
 class Schemas:
-    # ... (Keep existing CV schemas) ...
-    SCHEMA_CV = StructType([
-        StructField("id", StringType(), False),
-        StructField("source", StringType(), True),
-        StructField("education", StringType(), True),
-        StructField("experience", StringType(), True),
-        StructField("skills", StringType(), True)
-    ])
-
-    # NEW: Job Schema
-    SCHEMA_JOB = StructType([
-        StructField("id", StringType(), False),
-        StructField("source", StringType(), True),
-        StructField("title", StringType(), True),
-        StructField("company", StringType(), True),
-        StructField("description", StringType(), True),
-        StructField("skills", StringType(), True)
-    ])
+    # built on first use, importing the consumer must not import pyspark
+    SCHEMA_CV = SCHEMA_JOB = TEXT_DATA = PERSONAL_INFO = None
+
+    @classmethod
+    def load(cls):
+        if cls.SCHEMA_CV is not None: return cls
+        from pyspark.sql.types import StructType, StructField, StringType, IntegerType
+        # ... (Keep existing CV schemas) ...
+        cls.SCHEMA_CV = StructType([
+            StructField("id", StringType(), False),
+            StructField("source", StringType(), True),
+            StructField("education", StringType(), True),
+            StructField("experience", StringType(), True),
+            StructField("skills", StringType(), True)
+        ])
+
+        # NEW: Job Schema
+        cls.SCHEMA_JOB = StructType([
+            StructField("id", StringType(), False),
+            StructField("source", StringType(), True),
+            StructField("title", StringType(), True),
+            StructField("company", StringType(), True),
+            StructField("description", StringType(), True),
+            StructField("skills", StringType(), True)
+        ])
     
-    # Generic text schema (used for both CV and Job text)
-    TEXT_DATA = StructType([
-        StructField("id", StringType(), False),
-        StructField("source", StringType(), True),
-        StructField("text", StringType(), True),
-        StructField("text_length", IntegerType(), True)
-    ])
+        # Generic text schema (used for both CV and Job text)
+        cls.TEXT_DATA = StructType([
+            StructField("id", StringType(), False),
+            StructField("source", StringType(), True),
+            StructField("text", StringType(), True),
+            StructField("text_length", IntegerType(), True)
+        ])
     
-    PERSONAL_INFO = StructType([
-        StructField("id", StringType(), False),
-        StructField("source", StringType(), True),
-        StructField("name", StringType(), True),
-        StructField("email", StringType(), True),
-        StructField("linkedin", StringType(), True)
-    ])
+        cls.PERSONAL_INFO = StructType([
+            StructField("id", StringType(), False),
+            StructField("source", StringType(), True),
+            StructField("name", StringType(), True),
+            StructField("email", StringType(), True),
+            StructField("linkedin", StringType(), True)
+        ])
+        return cls
 
 # --- PARSING LOGIC ---
 class DataParser:
@@ -97,19 +117,76 @@ class DataParser:
             'text_length': len(text_content)
         }
 
+def empty_buffers():
+    # Expanded buffers
+    return {
+        'schema_cv': [], 'text_cv': [], 'info_cv': [],
+        'schema_job': [], 'text_job': [],
+        # scoring features, derived once here instead of at every reranking
+        'features_cv': [], 'features_job': []
+    }
+
+def buffer_record(buffers, topic, key, value):
+    """Adds a processed record to the buffers of its topic (shared with local_runner)."""
+    # ROUTING
+    if topic == "processed_schema_cv":
+        res = DataParser.parse_schema(key, value)
+        if res: buffers['schema_cv'].append(res)
+    elif topic == "processed_text_cv":
+        buffers['text_cv'].append(DataParser.parse_text(key, value))
+    elif topic == "processed_personal_info_cv":
+        buffers['info_cv'].append(DataParser.parse_personal_info(key, value))
+    
+    # JOB ROUTING
+    elif topic == "processed_schema_job":
+        res = DataParser.parse_job_schema(key, value)
+        if res: buffers['schema_job'].append(res)
+    elif topic == "processed_text_job":
+        buffers['text_job'].append(DataParser.parse_text(key, value))
+
+    # features last: a schema they cannot be derived from is still persisted
+    if topic in ("processed_schema_cv", "processed_schema_job"):
+        category = 'cv' if topic == "processed_schema_cv" else 'job'
+        try:
+            raw_schema = value.get('schema', '{}')
+            schema = json.loads(raw_schema) if isinstance(raw_schema, str) else raw_schema
+            buffers[f'features_{category}'].append(DERIVE[category](schema, value.get('id', key)))
+        except Exception as e:
+            logger.error(f"Error deriving {category} features of {value.get('id', key)}: {e}")
+
+def publish_staged(staging, output_path):
+    """Moves the part files of a committed Spark write into output_path/id=<id>/. Part names
+    are unique per write job, so several consumers can publish into the same folder."""
+    if not os.path.exists(os.path.join(staging, "_SUCCESS")):
+        return
+    for partition in os.listdir(staging):
+        if not partition.startswith("id="):
+            continue
+        target = os.path.join(output_path, partition)
+        os.makedirs(target, exist_ok=True)
+        for name in os.listdir(os.path.join(staging, partition)):
+            if name.endswith(".parquet"):
+                os.replace(os.path.join(staging, partition, name), os.path.join(target, name))
+    os.remove(os.path.join(staging, "_SUCCESS"))
+
 # --- PROCESSOR CORE ---
 class UnifiedProcessor:
     def __init__(self):
         self._init_spark()
         self._init_kafka()
-        # Expanded buffers
-        self.buffers = {
-            'schema_cv': [], 'text_cv': [], 'info_cv': [],
-            'schema_job': [], 'text_job': []
-        }
+        self.buffers = empty_buffers()
         self.last_flush_time = time.time()
+        # doc id -> arrival time, used to trace how long documents wait for a flush
+        self.received_at = {}
+        self.metrics = FlushMetrics()
+        self.staging_dir = os.path.join(Config.OUTPUT_DIR, "_staging", writer_id())
+        # the files a previous run of this writer committed but did not move yet
+        for folder_name in os.listdir(self.staging_dir) if os.path.isdir(self.staging_dir) else []:
+            publish_staged(os.path.join(self.staging_dir, folder_name), os.path.join(Config.OUTPUT_DIR, folder_name))
         
     def _init_spark(self):
+        from pyspark.sql import SparkSession
+        Schemas.load()
         self.spark = SparkSession.builder \
             .appName(Config.SPARK_APP_NAME) \
             .master(Config.SPARK_MASTER) \
@@ -117,21 +194,27 @@ class UnifiedProcessor:
             .getOrCreate()
 
     def _init_kafka(self):
+        from confluent_kafka import Consumer
         conf = {'bootstrap.servers': Config.KAFKA_BOOTSTRAP_SERVERS,
                 'group.id': Config.KAFKA_GROUP_ID,
                 'auto.offset.reset': 'earliest'}
         self.consumer = Consumer(conf)
         self.consumer.subscribe(list(Config.KAFKA_TOPICS))
 
-    def _save_buffer(self, buffer_data: List[Dict], schema: StructType, folder_name: str):
+    def _save_buffer(self, buffer_data: List[Dict], schema: "StructType", folder_name: str):
         if not buffer_data: return
         df = self.spark.createDataFrame(buffer_data, schema=schema)
-        output_path = os.path.join(Config.OUTPUT_DIR, folder_name)
-        df.write.mode("append").partitionBy("id").parquet(output_path)
+        # Spark commits through <path>/_temporary: every consumer writes to its own staging
+        # path, then moves the finished part files into the shared folder
+        staging = os.path.join(self.staging_dir, folder_name)
+        df.write.mode("overwrite").partitionBy("id").parquet(staging)
+        publish_staged(staging, os.path.join(Config.OUTPUT_DIR, folder_name))
         logger.info(f"✓ Saved {len(buffer_data)} records to {folder_name}")
 
-    def process_batch(self):
+    def process_batch(self, reason="size"):
         if not any(self.buffers.values()): return
+        flush_start = time.time()
+        sizes = {k: len(v) for k, v in self.buffers.items() if v}
         
         # Save CVs
         self._save_buffer(self.buffers['schema_cv'], Schemas.SCHEMA_CV, "schema_cv")
@@ -142,30 +225,37 @@ class UnifiedProcessor:
         self._save_buffer(self.buffers['schema_job'], Schemas.SCHEMA_JOB, "job_schema")
         self._save_buffer(self.buffers['text_job'], Schemas.TEXT_DATA, "job_text")
 
+        # Save scoring features
+        for category in ('cv', 'job'):
+            try:
+                write_features(category, self.buffers[f'features_{category}'])
+            except Exception as e:
+                logger.error(f"Error writing {category} features: {e}")
+
         for k in self.buffers: self.buffers[k] = []
         self.last_flush_time = time.time()
+        self.metrics.flushed(sizes, flush_start, self.last_flush_time, reason)
+
+        for doc_id, received in self.received_at.items():
+            record_stage("consumer_buffer_wait", doc_id, received, flush_start)
+            record_stage("process_batch", doc_id, flush_start, self.last_flush_time)
+        self.received_at = {}
+        touch_heartbeat()
 
     def _handle_message(self, msg):
         topic = msg.topic()
         key = msg.key().decode('utf-8') if msg.key() else "None"
         try:
             value = json.loads(msg.value().decode('utf-8'))
+
+            # the text message is the one every document has, trace on it only
+            if topic in ("processed_text_cv", "processed_text_job"):
+                doc_id = value.get('id', key)
+                trace = value.get('trace')
+                record_wait("etl_to_consumer", doc_id, json.loads(trace) if trace else None, "process_row")
+                self.received_at[doc_id] = time.time()
             
-            # ROUTING
-            if topic == "processed_schema_cv":
-                res = DataParser.parse_schema(key, value)
-                if res: self.buffers['schema_cv'].append(res)
-            elif topic == "processed_text_cv":
-                self.buffers['text_cv'].append(DataParser.parse_text(key, value))
-            elif topic == "processed_personal_info_cv":
-                self.buffers['info_cv'].append(DataParser.parse_personal_info(key, value))
-            
-            # JOB ROUTING
-            elif topic == "processed_schema_job":
-                res = DataParser.parse_job_schema(key, value)
-                if res: self.buffers['schema_job'].append(res)
-            elif topic == "processed_text_job":
-                self.buffers['text_job'].append(DataParser.parse_text(key, value))
+            buffer_record(self.buffers, topic, key, value)
                 
         except Exception as e:
             logger.error(f"Error in handle_message: {e}")
@@ -174,17 +264,19 @@ class UnifiedProcessor:
         try:
             while True:
                 msg = self.consumer.poll(timeout=1.0)
+                touch_heartbeat()
                 if (time.time() - self.last_flush_time) >= Config.BATCH_TIMEOUT:
-                    self.process_batch()
+                    self.process_batch(reason="timeout")
                 if msg is None: continue
                 if msg.error(): continue
                 
+                self.metrics.polled(msg)
                 self._handle_message(msg)
                 
                 if max(len(b) for b in self.buffers.values()) >= Config.BATCH_SIZE:
                     self.process_batch()
         except KeyboardInterrupt:
-            self.process_batch()
+            self.process_batch(reason="shutdown")
         finally:
             self.consumer.close()
             self.spark.stop()
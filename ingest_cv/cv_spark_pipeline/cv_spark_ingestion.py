@@ -1,197 +1,514 @@
 import json
 import os
 import sys
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, from_json, sha2, struct, udf
-from pyspark.sql.types import StringType, StructType, StructField, MapType
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
 
 # --- ENVIRONMENT SETUP ---
-home_dir = os.path.expanduser("~")
-conda_env_name = "talent_matching_linux"
-python_path = os.path.join(home_dir, "miniconda3", "envs", conda_env_name, "bin", "python")
-os.environ['PYSPARK_PYTHON'] = python_path
-os.environ['PYSPARK_DRIVER_PYTHON'] = python_path
-os.environ['PYSPARK_SUBMIT_ARGS'] = '--packages org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0 pyspark-shell'
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
 
-parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
+def setup_spark_env():
+    """Only the ETL itself needs the Spark variables and import paths, importing this module
+    must not set them: the pipeline modules are imported where they are used."""
+    for path in (PARENT_DIR, CURRENT_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    # Python workers must resolve the same modules as the driver
+    os.environ['PYTHONPATH'] = os.pathsep.join(
+        [PARENT_DIR, CURRENT_DIR] + [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep)
+                                     if p and p not in (PARENT_DIR, CURRENT_DIR)]
+    )
+    home_dir = os.path.expanduser("~")
+    conda_env_name = "talent_matching_linux"
+    python_path = os.path.join(home_dir, "miniconda3", "envs", conda_env_name, "bin", "python")
+    os.environ['PYSPARK_PYTHON'] = python_path
+    os.environ['PYSPARK_DRIVER_PYTHON'] = python_path
+    os.environ['PYSPARK_SUBMIT_ARGS'] = '--packages org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0 pyspark-shell'
 
-from download_model import model_validator
+# the producer routes the CVs of the transformer models to their own topic (cv_spark_producer.raw_topic)
+FAST_TOPICS = ("raw_resumes", "raw_jobs")
+SLOW_TOPICS = ("raw_resumes_models",)
+RAW_TOPICS = FAST_TOPICS + SLOW_TOPICS
+
+# --- DEDUPLICATION ---
+DEDUP_WATERMARK = "24 hours"    # a hash leaves the dedup state this long after it was read
+DEDUP_TIME = "dedup_ts"         # processing-time column the watermark runs on
+# checkpoints of the plan with RocksDB, dropDuplicatesWithinWatermark and one query per lane:
+# the "checkpoints_unified_etl*" folders of the earlier plan cannot be restarted by it
+CHECKPOINT_ROOT = "checkpoints_etl_v2"
+# RocksDB keeps the dedup state off the JVM heap, changelog checkpointing uploads only each batch's changes
+STATE_STORE_CONF = {
+    "spark.sql.streaming.stateStore.providerClass":
+        "org.apache.spark.sql.execution.streaming.state.RocksDBStateStoreProvider",
+    "spark.sql.streaming.stateStore.rocksdb.changelogCheckpointing.enabled": "true",
+}
+
+def deduplicate(df, watermark=DEDUP_WATERMARK):
+    """Drops records whose content_hash was already seen within the watermark, older hashes expire.
+    The watermark runs on the time the ETL reads a record, not on its Kafka timestamp: with two
+    topics and throttled partitions read at different paces, a lagging partition's records would
+    fall behind the watermark and be dropped as late, silently. No record is late in processing time."""
+    from pyspark.sql.functions import current_timestamp
+    return df.withColumn(DEDUP_TIME, current_timestamp()) \
+        .withWatermark(DEDUP_TIME, watermark) \
+        .dropDuplicatesWithinWatermark(["content_hash"])
+
+# --- CONTENT REGISTRY ---
+def known_elsewhere(docs):
+    """Docs whose content was already parsed under another id: {position: that id}.
+    The same id is parsed again, a replayed batch must still reach the topics."""
+    from content_registry import PROCESSED, get_registry
+    known = get_registry().lookup([doc['content_hash'] for doc in docs])
+    skipped = dict()
+    for i, doc in enumerate(docs):
+        entry = known.get(doc['content_hash'])
+        if entry and entry[1] == PROCESSED and entry[0] != doc['id']:
+            skipped[i] = entry[0]
+    return skipped
+
+def duplicate_result(doc, original_id):
+    return {"id": doc['id'], "source": doc['source'], "is_job": "duplicate", "schema_json": "{}",
+            "text_output": "{}", "personal_info": "{}", "error": f"already processed as {original_id}"}
+
+def mark_processed(docs, results):
+    from content_registry import get_registry
+    entries = [(doc['content_hash'], doc['id'], doc['category'])
+               for doc, result in zip(docs, results) if not result.get("error")]
+    if entries:
+        get_registry().mark_processed(entries)
 
 def process_row(row):
     """Router: Processes Jobs if 'category' exists, otherwise processes CVs"""
     import json
-    # Job Imports
-    from cleaning_logic.clean_postings import schematize_posting
-    from job_processing.job_formatting import job_text 
-    
-    # CV Imports
-    from cv_processing.cv_formatting import cv_formatter
-    from cv_processing.string_cvs_processing import CVParserNLP
-    from cv_processing.string_dataset_processing import CVParserDATASET
-    from cv_processing.linkedin_pdf_processing import extract_cv_data
-    from cv_processing.json_dataset_processing import reprocess_json
-
-    doc_id = row['id']
-    source = row['source']
-    raw_data = row['raw_data']
-    data_type = row['type']
-    category = row.get('category')  # This is the differentiator
+    from cv_processing.document_router import route_document, select_parser
+    from pipeline_trace import record_wait, stamp, trace_stage
+
+    doc = row.asDict()
+    doc_id = doc['id']
+    trace = doc['trace'] or {}
+    record_wait("kafka_to_etl", doc_id, trace, "ingest_data")
+    skipped = known_elsewhere([doc])
+    if skipped:
+        result = duplicate_result(doc, skipped[0])
+    else:
+        parser = select_parser(doc['source'], doc['type'], doc['category'])
+        with trace_stage(f"process_row.{parser}", doc_id, source=doc['source']):
+            result = route_document(doc_id, doc['source'], doc['raw_data'], doc['type'], doc['category'])
+        mark_processed([doc], [result])
+    result["trace"] = json.dumps(stamp(trace, "process_row"))
+    return result
+
+RESULT_FIELDS = ["id", "source", "is_job", "schema_json", "text_output", "personal_info", "error", "trace"]
+ARROW_BATCH_ROWS = 64   # rows per Arrow batch handed to process_partition
+
+def parse_documents(docs, stage="process_partition"):
+    """Parses a batch of raw documents, in order. Content already parsed under another id
+    never reaches the models, the CVs of a model-backed parser are parsed together."""
+    from cv_processing.document_router import route_documents
+    from pipeline_metrics import record_metric
+    from pipeline_trace import record_stage, trace_stage
+
+    skipped = known_elsewhere(docs)
+    fresh = [doc for i, doc in enumerate(docs) if i not in skipped]
+    timings, spans = dict(), []
+    with trace_stage(stage, [doc['id'] for doc in fresh], rows=len(fresh)):
+        routed = route_documents(fresh, timings, spans)
+    # the per-parser stages of process_row; a batched parser call is recorded for each of its documents
+    for parser, indexes, start, end in spans:
+        for i in indexes:
+            record_stage(f"process_row.{parser}", fresh[i]['id'], start, end,
+                         source=fresh[i]['source'], rows=len(indexes))
+    for parser, (rows, seconds) in timings.items():
+        record_metric("parser", parser=parser, rows=rows, duration_ms=round(seconds * 1000, 3),
+                      ms_per_row=round(seconds * 1000 / rows, 3) if rows else None)
+    mark_processed(fresh, routed)
+    routed = iter(routed)
+    return [duplicate_result(doc, skipped[i]) if i in skipped else next(routed)
+            for i, doc in enumerate(docs)]
+
+def process_partition(batches):
+    """mapInPandas body: whole Arrow batches, the CVs of a model-backed parser are parsed together"""
+    import json
+    import pandas as pd
+    from pipeline_trace import record_wait, stamp
+
+    for pdf in batches:
+        docs = pdf.to_dict("records")
+        traces = []
+        for doc in docs:
+            # Arrow hands MapType values over as lists of (key, value) pairs
+            trace = dict(doc['trace']) if doc['trace'] is not None else {}
+            record_wait("kafka_to_etl", doc['id'], trace, "ingest_data")
+            traces.append(trace)
+        results = parse_documents(docs)
+        for result, trace in zip(results, traces):
+            result["trace"] = json.dumps(stamp(trace, "process_row"))
+        yield pd.DataFrame(results, columns=RESULT_FIELDS)
+
+def kafka_source_options(worker_index=0, worker_count=1, partitions=1, topics=RAW_TOPICS):
+    """With several ETL workers each one reads its own share of the partitions,
+    otherwise every worker would process the whole stream."""
+    if worker_count <= 1:
+        return {"subscribe": ",".join(topics)}
+    own = [p for p in range(partitions) if p % worker_count == worker_index]
+    return {"assign": json.dumps({topic: own for topic in topics})}
+
+# --- LANES ---
+@dataclass
+class Lane:
+    """One streaming query over its own raw topics, with its own trigger and FAIR pool."""
+    name: str
+    trigger: str
+    weight: int             # FAIR pool weight
+    min_share: int          # cores the pool gets before the others when it has work
+    partitions: int = 0     # repartition before parsing, 0 keeps the Kafka partitions
+    max_offsets: int = 0    # maxOffsetsPerTrigger over the lane's topics, 0 reads the whole backlog
+    topics: tuple = RAW_TOPICS
+    stall_seconds: float = 300.0    # a batch running longer stops the heartbeat, unless its size
+                                    # and the measured time per record say it needs longer (StallWatch)
+
+    @property
+    def trigger_seconds(self):
+        value, unit = self.trigger.split()
+        return float(value) * (60 if unit.startswith("minute") else 1)
+
+def default_lanes(num_workers, max_offsets=None):
+    # fast: json datasets, pdfs and postings, no model; slow: CVs parsed by the transformer models
+    slow_cores = max(1, num_workers - 1)
+    lanes = [
+        Lane("fast", "2 seconds", weight=1, min_share=1, max_offsets=5000, topics=FAST_TOPICS),
+        Lane("slow", "10 seconds", weight=3, min_share=slow_cores, partitions=slow_cores, max_offsets=200,
+             topics=SLOW_TOPICS, stall_seconds=900.0),
+    ]
+    if max_offsets is not None:
+        for lane in lanes:
+            lane.max_offsets = max_offsets
+    return lanes
+
+def single_lane(max_offsets=2000):
+    return Lane("all", "10 seconds", weight=1, min_share=0, max_offsets=max_offsets, stall_seconds=900.0)
+
+def write_pool_file(lanes):
+    """FAIR scheduler allocation file with one pool per lane."""
+    pools = "".join(
+        f'<pool name="{lane.name}"><schedulingMode>FIFO</schedulingMode>'
+        f'<weight>{lane.weight}</weight><minShare>{lane.min_share}</minShare></pool>'
+        for lane in lanes
+    )
+    fd, path = tempfile.mkstemp(prefix="cv_etl_pools_", suffix=".xml")
+    with os.fdopen(fd, "w") as f:
+        f.write(f'<?xml version="1.0"?><allocations>{pools}</allocations>')
+    return path
+
+# --- BACKPRESSURE ---
+@dataclass
+class RateConfig:
+    adaptive: bool = False
+    target_fraction: float = 0.8   # a full batch should take this share of its lane's trigger interval
+    min_offsets: int = 20
+    max_offsets: int = 50000
+    window: int = 3                # full batches observed before resizing
+    tolerance: float = 2.0         # resize only when the ideal size is this many times off
+    interval: float = 5.0          # seconds between two looks at the queries' progress
+
+class AdaptiveRate:
+    """Sizes a lane's maxOffsetsPerTrigger from the per-record time of its last full batches."""
+
+    def __init__(self, target_seconds, config: RateConfig):
+        self.target_seconds = target_seconds
+        self.config = config
+        self.samples = []
+        self.last_batch = None
+
+    def observe(self, progress, limit):
+        if not progress or progress["batchId"] == self.last_batch:
+            return
+        self.last_batch = progress["batchId"]
+        rows = progress["numInputRows"]
+        # only batches capped by the limit say something about it, a drained backlog does not
+        if rows > 0 and (not limit or rows * 2 >= limit):
+            self.samples.append((rows, progress["durationMs"].get("triggerExecution", 0)))
+            self.samples = self.samples[-self.config.window:]
+
+    def proposal(self, limit):
+        """New limit, or None to keep the current one."""
+        if len(self.samples) < self.config.window:
+            return None
+        seconds_per_record = sum(ms for _, ms in self.samples) / 1000 / sum(rows for rows, _ in self.samples)
+        ideal = int(self.target_seconds / max(seconds_per_record, 1e-6))
+        ideal = min(self.config.max_offsets, max(self.config.min_offsets, ideal))
+        if limit and limit / self.config.tolerance < ideal < limit * self.config.tolerance:
+            return None
+        self.samples = []
+        return ideal
 
+def stop_after_batch(query):
+    """Lets the running micro-batch commit, then stops the query."""
+    while query.isActive and query.status["isTriggerActive"]:
+        time.sleep(1)
+    query.stop()
+
+def run_lanes(lanes, start_lane, rate=RateConfig(), should_stop=None):
+    """Starts one query per lane and watches them. In adaptive mode a lane whose batches are
+    too long or too short is restarted from its checkpoint with a new maxOffsetsPerTrigger.
+    Returns the {lane name: query} dict once should_stop() is true, raises if a query failed."""
+    limits = {lane.name: lane.max_offsets for lane in lanes}
+    queries = {lane.name: start_lane(lane, limits[lane.name]) for lane in lanes}
+    rates = {lane.name: AdaptiveRate(lane.trigger_seconds * rate.target_fraction, rate)
+             for lane in lanes} if rate.adaptive else {}
     try:
-        # --- PATH A: JOB PROCESSING ---
-        if category == "job":
-            print(f"[{doc_id}] Processing as JOB")
-            job_dict = json.loads(raw_data) if isinstance(raw_data, str) else raw_data
-            
-            # Step 1: Schematize
-            schema_data = schematize_posting(job_dict)
-            # Step 2: Extract Text
-            text_out = job_text(schema_data)
-            
-            return {
-                "id": doc_id, "source": source, "is_job": "True",
-                "schema_json": json.dumps(schema_data),
-                "text_output": json.dumps({"text": text_out, "id": doc_id}),
-                "personal_info": "{}", "error": None
-            }
-
-        # --- PATH B: CV PROCESSING ---
-        else:
-            print(f"[{doc_id}] Processing as CV")
-            schema_data = None
-            if source == "new_texts" or "txt" in data_type:
-                schema_data = CVParserNLP().parse(raw_data)
-            elif source == "linkedin_pdf" or "pdf" in data_type:
-                schema_data = extract_cv_data(raw_data)
-            elif source == "string_dataset":
-                schema_data = CVParserDATASET().parse(raw_data)
-            elif source == "json_dataset":
-                schema_data = reprocess_json(json.loads(raw_data))
-            
-            if schema_data and "Error" not in schema_data:
-                # Internal helper for CV formatting
-                from cv_processing.cv_formatting import cv_formatter
-                text_out, pers_info = cv_formatter(schema_data)
-                
-                # Add ID to dictionaries for consistency
-                schema_data["id"] = doc_id
-                pers_info["id"] = doc_id
-
-                return {
-                    "id": doc_id, "source": source, "is_job": "False",
-                    "schema_json": json.dumps(schema_data),
-                    "text_output": json.dumps({"text": text_out, "id": doc_id}),
-                    "personal_info": json.dumps(pers_info),
-                    "error": None
-                }
-            else:
-                return {"id": doc_id, "source": source, "is_job": "False", "schema_json": "{}", 
-                        "text_output": "{}", "personal_info": "{}", "error": "Parser failed"}
-
-    except Exception as e:
-        return {"id": doc_id, "source": source, "is_job": "error", "schema_json": "{}", 
-                "text_output": "{}", "personal_info": "{}", "error": str(e)}
-
-process_udf = udf(process_row, MapType(StringType(), StringType()))
-
-def run_spark_etl(num_workers=4):
+        while all(query.isActive for query in queries.values()):
+            time.sleep(rate.interval)
+            if should_stop is not None and should_stop(queries):
+                break
+            for lane in lanes:
+                controller = rates.get(lane.name)
+                if controller is None:
+                    continue
+                controller.observe(queries[lane.name].lastProgress, limits[lane.name])
+                new_limit = controller.proposal(limits[lane.name])
+                if new_limit is not None:
+                    print(f"[{lane.name}] maxOffsetsPerTrigger {limits[lane.name] or 'unlimited'} -> {new_limit}")
+                    stop_after_batch(queries[lane.name])
+                    limits[lane.name] = new_limit
+                    queries[lane.name] = start_lane(lane, new_limit)
+        failed = [query for query in queries.values() if not query.isActive and query.exception()]
+        if failed:
+            # a failed lane stops the worker, the supervisor restarts it
+            raise failed[0].exception()
+    finally:
+        for query in queries.values():
+            stop_after_batch(query)
+    return queries
+
+# --- HEARTBEAT ---
+STALL_MARGIN = 3.0      # a batch is stuck after this many times the duration expected from its size
+
+class StallWatch:
+    """How long a lane's micro-batch may run before the heartbeat stops and the supervisor
+    restarts the worker: the lane's stall_seconds, or more when the batch size (the current
+    maxOffsetsPerTrigger, else the largest batch seen) times the measured time per record
+    says a healthy batch needs longer."""
+
+    def __init__(self, lanes):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.limits = {lane.name: lane.max_offsets for lane in lanes}
+        self.seconds_per_record = dict()
+        self.max_rows = dict()
+        self.last_batch = dict()
+
+    def started(self, lane, max_offsets):
+        # run_lanes restarts a lane with a new limit in adaptive mode
+        self.limits[lane.name] = max_offsets
+
+    def observe(self, lane_name, progress):
+        if not progress or progress["numInputRows"] <= 0 or self.last_batch.get(lane_name) == progress["batchId"]:
+            return
+        self.last_batch[lane_name] = progress["batchId"]
+        rows = progress["numInputRows"]
+        self.seconds_per_record[lane_name] = progress["durationMs"].get("triggerExecution", 0) / 1000 / rows
+        self.max_rows[lane_name] = max(self.max_rows.get(lane_name, 0), rows)
+
+    def limit(self, lane_name):
+        lane = self.lanes[lane_name]
+        per_record = self.seconds_per_record.get(lane_name)
+        if per_record is None:
+            return lane.stall_seconds
+        rows = self.limits[lane_name] or self.max_rows[lane_name]
+        return max(lane.stall_seconds, STALL_MARGIN * rows * per_record)
+
+def _keep_alive(spark, stop_event, running, watch, interval=10):
+    """Beats while the queries are up and no micro-batch is stuck. Idle queries start no batch,
+    so the beat cannot come from the batches alone; running maps a lane to its batch's start."""
+    from pipeline_supervisor import touch_heartbeat
+    while not stop_event.wait(interval):
+        for query in spark.streams.active:
+            lane_name = (query.name or "").replace("etl_", "", 1)
+            if lane_name in watch.lanes:
+                watch.observe(lane_name, query.lastProgress)
+        now = time.time()
+        stalled = [(lane, watch.limit(lane)) for lane, started in list(running.items())
+                   if now - started > watch.limit(lane)]
+        if stalled:
+            print("Batch stuck: " + ", ".join(f"{lane} lane over {limit:.0f}s" for lane, limit in stalled))
+            continue
+        # the adaptive mode restarts queries: look at the ones running now
+        if spark.streams.active:
+            touch_heartbeat()
+
+def run_spark_etl(num_workers=4, worker_index=0, worker_count=1, partitions=1, batch_udf=True,
+                  dedup_watermark=DEDUP_WATERMARK, lanes=None, rate=RateConfig(), torch_threads=0):
+    setup_spark_env()
+    from download_model import model_validator
+    from cv_processing.model_registry import thread_env, threads_per_worker
+    from pipeline_metrics import make_listener
+    from pipeline_trace import record_stage
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import array, coalesce, col, explode, from_json, lit, sha2, struct, to_json, udf, when
+    from pyspark.sql.types import StringType, StructType, StructField, MapType, DoubleType
+
+    RESULT_SCHEMA = StructType([StructField(name, StringType(), True) for name in RESULT_FIELDS])
+    process_udf = udf(process_row, RESULT_SCHEMA)
     model_validator()
+    if lanes is None:
+        lanes = default_lanes(num_workers)
+    # every task slot of every ETL worker on this machine may run the models at once;
+    # the Python workers are forked by the JVM and inherit this environment
+    if not torch_threads:
+        torch_threads = threads_per_worker(num_workers * worker_count)
+    os.environ.update(thread_env(torch_threads))
+    print(f"torch threads per Python worker: {torch_threads} ({num_workers} task slots x {worker_count} ETL workers)")
     
-    spark = SparkSession.builder \
+    # python workers outlive a task, so model_registry keeps the parsers loaded between rows
+    builder = SparkSession.builder \
         .master(f"local[{num_workers}]") \
         .appName("CV_Job_Unified_Processor") \
         .config("spark.driver.memory", "4g") \
-        .getOrCreate()
+        .config("spark.python.worker.reuse", "true") \
+        .config("spark.sql.execution.arrow.maxRecordsPerBatch", str(ARROW_BATCH_ROWS)) \
+        .config("spark.scheduler.mode", "FAIR") \
+        .config("spark.scheduler.allocation.file", write_pool_file(lanes))
+    for key, value in STATE_STORE_CONF.items():
+        builder = builder.config(key, value)
+    spark = builder.getOrCreate()
     
     spark.sparkContext.setLogLevel("WARN")
-
-    # 1. READ FROM KAFKA (Listening to both topics)
-    df_raw = spark.readStream \
-        .format("kafka") \
-        .option("kafka.bootstrap.servers", "localhost:9092") \
-        .option("subscribe", "raw_resumes,raw_jobs") \
-        .option("startingOffsets", "earliest") \
-        .load()
+    # per-batch input rows, rates, durations and state size -> pipeline_metrics.jsonl
+    spark.streams.addListener(make_listener())
 
     input_schema = StructType([
         StructField("id", StringType(), True),
         StructField("raw_data", StringType(), True),
         StructField("source", StringType(), True),
         StructField("type", StringType(), True),
-        StructField("category", StringType(), True) # Important: identifies Jobs
+        StructField("category", StringType(), True), # Important: identifies Jobs
+        StructField("content_hash", StringType(), True), # set by the producer, see content_registry
+        StructField("trace", MapType(StringType(), DoubleType()), True)
     ])
 
-    parsed_df = df_raw.selectExpr("CAST(value AS STRING)") \
-        .select(from_json("value", input_schema).alias("data")) \
-        .select("data.*")
-
-    # 2. DEDUP
-    df_unique = parsed_df.withColumn("content_hash", sha2(col("raw_data"), 256)) \
-        .dropDuplicates(["content_hash"])
+    def read_stream(topics, max_offsets):
+        # 1. READ FROM KAFKA (the lane's own topics), at most max_offsets records per batch
+        reader = spark.readStream \
+            .format("kafka") \
+            .option("kafka.bootstrap.servers", "localhost:9092") \
+            .options(**kafka_source_options(worker_index, worker_count, partitions, topics)) \
+            .option("startingOffsets", "earliest")
+        if max_offsets:
+            reader = reader.option("maxOffsetsPerTrigger", str(max_offsets))
+        parsed_df = reader.load().selectExpr("CAST(value AS STRING)") \
+            .select(from_json("value", input_schema).alias("data")) \
+            .select("data.*")
+        return parsed_df.withColumn("content_hash", coalesce(col("content_hash"), sha2(col("raw_data"), 256)))
 
     # 3. PROCESS AND ROUTE
-    def process_and_write(batch_df, batch_id):
-        if batch_df.isEmpty(): return
-        
-        print(f"\n=== Processing Batch {batch_id} ===")
-        # Apply UDF
-        processed_df = batch_df.withColumn("res", process_udf(struct([col(c) for c in batch_df.columns])))
-        results_df = processed_df.select("res.*").cache()
+    def kafka_record(topic, field, alias):
+        return struct(lit(topic).alias("topic"),
+                      to_json(struct(col("id"), col(field).alias(alias), col("source"), col("trace"))).alias("value"))
+
+    # every processed document becomes one Kafka record per output topic
+    outputs = when(col("is_job") == "True", array(
+        kafka_record("processed_schema_job", "schema_json", "schema"),
+        kafka_record("processed_text_job", "text_output", "text"),
+    )).otherwise(array(
+        kafka_record("processed_schema_cv", "schema_json", "schema"),
+        kafka_record("processed_text_cv", "text_output", "text"),
+        kafka_record("processed_personal_info_cv", "personal_info", "info"),
+    ))
+
+    running = dict()    # lane name -> start of its micro-batch, watched by _keep_alive
+    watch = StallWatch(lanes)
+
+    def process_and_write(batch_df, batch_id, lane):
+        running[lane.name] = time.time()
+        try:
+            write_batch(batch_df, batch_id, lane)
+        finally:
+            running.pop(lane.name, None)
+
+    def write_batch(batch_df, batch_id, lane):
+        print(f"\n=== Processing Batch {batch_id} ({lane.name} lane) ===")
+        batch_start = time.time()
+        # foreachBatch runs on a callback thread: the pool is set where the jobs are submitted
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", lane.name)
+        if lane.partitions:
+            # the models get every core of the lane even when Kafka has a single partition
+            batch_df = batch_df.repartition(lane.partitions)
+        if batch_udf:
+            # Arrow batches, parsed per source with the models' batch entry points
+            results_df = batch_df.mapInPandas(process_partition, RESULT_SCHEMA)
+        else:
+            # Apply UDF, one row at a time
+            processed_df = batch_df.withColumn("res", process_udf(struct([col(c) for c in batch_df.columns])))
+            results_df = processed_df.select("res.*")
 
         # Filter for Successful results
-        success_df = results_df.filter((col("error").isNull()) | (col("error") == ""))
-
-        # --- ROUTE JOBS ---
-        jobs_df = success_df.filter(col("is_job") == "True")
-        if not jobs_df.isEmpty():
-            print(f"Batch {batch_id}: Writing {jobs_df.count()} Jobs to Kafka...")
-            # Job Schema
-            jobs_df.select(col("id").alias("key"), 
-                struct(col("id"), col("schema_json").alias("schema"), col("source")).alias("v")) \
-                .selectExpr("key", "to_json(v) AS value") \
-                .write.format("kafka").option("topic", "processed_schema_job") \
-                .option("kafka.bootstrap.servers", "localhost:9092").save()
-            # Job Text
-            jobs_df.select(col("id").alias("key"), 
-                struct(col("id"), col("text_output").alias("text"), col("source")).alias("v")) \
-                .selectExpr("key", "to_json(v) AS value") \
-                .write.format("kafka").option("topic", "processed_text_job") \
-                .option("kafka.bootstrap.servers", "localhost:9092").save()
-
-        # --- ROUTE CVS ---
-        cvs_df = success_df.filter(col("is_job") == "False")
-        if not cvs_df.isEmpty():
-            print(f"Batch {batch_id}: Writing {cvs_df.count()} CVs to Kafka...")
-            # CV Schema
-            cvs_df.select(col("id").alias("key"), 
-                struct(col("id"), col("schema_json").alias("schema"), col("source")).alias("v")) \
-                .selectExpr("key", "to_json(v) AS value") \
-                .write.format("kafka").option("topic", "processed_schema_cv") \
-                .option("kafka.bootstrap.servers", "localhost:9092").save()
-            # CV Text
-            cvs_df.select(col("id").alias("key"), 
-                struct(col("id"), col("text_output").alias("text"), col("source")).alias("v")) \
-                .selectExpr("key", "to_json(v) AS value") \
-                .write.format("kafka").option("topic", "processed_text_cv") \
-                .option("kafka.bootstrap.servers", "localhost:9092").save()
-            # CV Personal Info
-            cvs_df.select(col("id").alias("key"), 
-                struct(col("id"), col("personal_info").alias("info"), col("source")).alias("v")) \
-                .selectExpr("key", "to_json(v) AS value") \
-                .write.format("kafka").option("topic", "processed_personal_info_cv") \
-                .option("kafka.bootstrap.servers", "localhost:9092").save()
-
-        results_df.unpersist()
-
-    query = df_unique.writeStream \
-        .foreachBatch(process_and_write) \
-        .option("checkpointLocation", "checkpoints_unified_etl") \
-        .trigger(processingTime='10 seconds') \
-        .start()
-
-    query.awaitTermination()
+        success_df = results_df.filter((col("error").isNull()) | (col("error") == "")) \
+            .filter(col("is_job").isin("True", "False"))
+
+        # --- ROUTE JOBS AND CVS: one Kafka write, the topic is a column ---
+        success_df.select(col("id").alias("key"), explode(outputs).alias("out")) \
+            .select("key", "out.topic", "out.value") \
+            .write.format("kafka") \
+            .option("kafka.bootstrap.servers", "localhost:9092").save()
+
+        # one record per batch: listing the ids would cost another Spark job
+        record_stage("process_and_write", None, batch_start, time.time(), batch_id=batch_id, lane=lane.name)
+
+    checkpoint = CHECKPOINT_ROOT if worker_count <= 1 else f"{CHECKPOINT_ROOT}_{worker_index}"
+
+    def start_lane(lane, max_offsets):
+        watch.started(lane, max_offsets)
+        hashed_df = read_stream(lane.topics, max_offsets)
+        # 2. DEDUP (bounded: the state only holds the hashes seen within the watermark)
+        df_unique = deduplicate(hashed_df, dedup_watermark)
+        # the query's own jobs (Kafka reads, dedup state) run in the lane's FAIR pool too
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", lane.name)
+        return df_unique.writeStream \
+            .queryName(f"etl_{lane.name}") \
+            .foreachBatch(lambda batch_df, batch_id, lane=lane: process_and_write(batch_df, batch_id, lane)) \
+            .option("checkpointLocation", f"{checkpoint}_{lane.name}") \
+            .trigger(processingTime=lane.trigger) \
+            .start()
+
+    stop_event = threading.Event()
+    threading.Thread(target=_keep_alive, args=(spark, stop_event, running, watch), daemon=True).start()
+    try:
+        run_lanes(lanes, start_lane, rate)
+    except KeyboardInterrupt:
+        # graceful drain: run_lanes lets the running micro-batches commit before stopping
+        print("Stopping after the current batches...")
+    finally:
+        stop_event.set()
+        spark.stop()
 
 if __name__ == "__main__":
-    run_spark_etl()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Spark ETL worker")
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--worker-index", type=int, default=0)
+    parser.add_argument("--worker-count", type=int, default=1)
+    parser.add_argument("--partitions", type=int, default=1)
+    parser.add_argument("--row-udf", action="store_true", help="process one row at a time instead of Arrow batches")
+    parser.add_argument("--dedup-watermark", default=DEDUP_WATERMARK, help='e.g. "24 hours"')
+    parser.add_argument("--single-lane", action="store_true", help="one query for every source")
+    parser.add_argument("--max-offsets", type=int, default=None,
+                        help="maxOffsetsPerTrigger of every lane (0 = unlimited), default per lane")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="resize maxOffsetsPerTrigger from the observed per-record time")
+    parser.add_argument("--torch-threads", type=int, default=0,
+                        help="torch threads per Python worker, 0 = cores / (num-workers x worker-count)")
+    parser.add_argument("--stall-seconds", type=float, default=None,
+                        help="minimum time a batch may run before the worker counts as stuck, default per lane")
+    args = parser.parse_args()
+    if args.single_lane:
+        lanes = [single_lane() if args.max_offsets is None else single_lane(args.max_offsets)]
+    else:
+        lanes = default_lanes(args.num_workers, args.max_offsets)
+    if args.stall_seconds is not None:
+        for lane in lanes:
+            lane.stall_seconds = args.stall_seconds
+    run_spark_etl(args.num_workers, args.worker_index, args.worker_count, args.partitions, not args.row_udf,
+                  args.dedup_watermark, lanes, RateConfig(adaptive=args.adaptive), args.torch_threads)
\ No newline at end of file
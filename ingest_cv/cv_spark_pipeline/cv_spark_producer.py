@@ -1,16 +1,32 @@
 import json
 import os
+import sys
+import time
 import base64
+import fcntl
 import logging
-from confluent_kafka import Producer
-import pandas as pd
+from contextlib import contextmanager
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+for path in (parent_dir, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from pipeline_trace import record_stage, stamp
+from content_registry import PROCESSED, content_hash, get_registry
 
 # --- CONFIGURATION ---
 RESUME_STATE_FILE = 'id_counter_resumes.txt'
 JOB_STATE_FILE = 'id_counter_jobs.txt'
 
+COMMIT_EVERY = 200     # records registered between two commits of the registry
+ID_BLOCK = 200         # ids the producer reserves from a counter at once
+
 TOPIC_RESUMES = 'raw_resumes'
+TOPIC_RESUMES_MODELS = 'raw_resumes_models'     # CVs parsed by the transformer models
 TOPIC_JOBS = 'raw_jobs'
+RAW_TOPICS = (TOPIC_RESUMES, TOPIC_JOBS, TOPIC_RESUMES_MODELS)
 
 KAFKA_CONF = {
     'bootstrap.servers': 'localhost:9092', 
@@ -27,6 +43,15 @@ def delivery_report(err, msg):
     else:
         print(f'Messaggio inviato a {msg.topic()} [Partition: {msg.partition()}]')
 
+def raw_topic(source, f_type, category):
+    """Each ETL lane reads its own topics, so its maxOffsetsPerTrigger counts only its records."""
+    from cv_processing.document_router import BATCH_PARSERS, select_parser
+    if category == 'job':
+        return TOPIC_JOBS
+    if select_parser(source, f_type, category) in BATCH_PARSERS:
+        return TOPIC_RESUMES_MODELS
+    return TOPIC_RESUMES
+
 # --- STATE MANAGEMENT ---
 def get_next_id(state_file):
     """Reads the counter for a specific state file."""
@@ -39,9 +64,44 @@ def get_next_id(state_file):
             return 1
 
 def update_state_file(state_file, last_id):
-    """Saves the last used ID to the specific state file."""
-    with open(state_file, 'w') as f:
+    """Saves the last used ID to the specific state file (renamed into place, never half-written)."""
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
         f.write(str(last_id))
+    os.replace(tmp_file, state_file)
+
+@contextmanager
+def _counter_lock(state_file):
+    with open(f"{state_file}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def reserve_ids(state_file, count=1):
+    """First of `count` consecutive ids, taken from the counter under a file lock: the producer,
+    the local runner and the matching service never hand out the same id."""
+    with _counter_lock(state_file):
+        first = get_next_id(state_file)
+        update_state_file(state_file, first + count - 1)
+    return first
+
+class IdBlocks:
+    """Hands out the ids of a counter in blocks of ID_BLOCK reserved ids. The ids left in a
+    block when the process stops are never used."""
+
+    def __init__(self, state_file, block=ID_BLOCK):
+        self.state_file = state_file
+        self.block = block
+        self.next_id = self.end = 0
+
+    def take(self):
+        if self.next_id >= self.end:
+            self.next_id = reserve_ids(self.state_file, self.block)
+            self.end = self.next_id + self.block
+        self.next_id += 1
+        return self.next_id - 1
 
 # --- FILE HANDLERS ---
 def yield_jsonl_records(path):
@@ -68,6 +128,7 @@ def yield_text_record(path):
         yield f.read()
 
 def yield_csv_records(path, column_name='Resume_str'):
+    import pandas as pd
     try:
         df = pd.read_csv(path)
         for text in df[column_name]:
@@ -76,15 +137,22 @@ def yield_csv_records(path, column_name='Resume_str'):
         print(f"Errore lettura CSV: {e}")
 
 # --- MAIN LOGIC ---
-def ingest_data(files_to_process):
-    p = Producer(KAFKA_CONF)
+def iter_payloads(files_to_process, skip_known=True, stats=None):
+    """(topic, payload, read time) of every record of the files, with a fresh or reused id.
+    With skip_known, content already parsed is skipped and content sent but not parsed yet
+    keeps its first id. The registry is committed every COMMIT_EVERY records, so its write lock
+    is never held for long (the ETL writes to it too). Ids are reserved from the counters before
+    they are used, so a crash never lets an id be reused."""
+    registry = get_registry()
+    stats = stats if stats is not None else dict()
+    stats.setdefault("skipped", 0)
     
     # Initialize both counters
-    resume_id = get_next_id(RESUME_STATE_FILE)
-    job_id = get_next_id(JOB_STATE_FILE)
-    
-    total_sent = 0
-    print(f"--- Starting Ingestion | Resumes: A{resume_id} | Jobs: B{job_id} ---")
+    resume_ids = IdBlocks(RESUME_STATE_FILE)
+    job_ids = IdBlocks(JOB_STATE_FILE)
+    print(f"--- Starting Ingestion | Resumes: A{get_next_id(RESUME_STATE_FILE)} | "
+          f"Jobs: B{get_next_id(JOB_STATE_FILE)} ---")
+    pending = 0
 
     for file_info in files_to_process:
         f_path = file_info['path']
@@ -107,43 +175,63 @@ def ingest_data(files_to_process):
         else: continue
 
         for raw_content in iterator:
+            read_done = time.time()
+            h = content_hash(raw_content)
+            known = registry.lookup([h]).get(h) if skip_known else None
+            if known and known[1] == PROCESSED:
+                stats["skipped"] += 1
+                continue
+            target_topic = raw_topic(f_source, f_type, f_category)
             # Logic for separate ID prefix and counter
-            if f_category == 'job':
-                unique_id = f"B{job_id}"
-                target_topic = TOPIC_JOBS
-                job_id += 1
+            if known:
+                unique_id = known[0]
+            elif f_category == 'job':
+                unique_id = f"B{job_ids.take()}"
             else:
-                unique_id = f"A{resume_id}"
-                target_topic = TOPIC_RESUMES
-                resume_id += 1
+                unique_id = f"A{resume_ids.take()}"
+            registry.register(h, unique_id, f_category)
+            pending += 1
+            if pending >= COMMIT_EVERY:
+                registry.commit()
+                pending = 0
             
             payload = {
                 "id": unique_id,
                 "raw_data": raw_content, 
                 "source": f_source,
                 "type": f_type,
-                "category": f_category 
+                "category": f_category,
+                "content_hash": h,
+                "trace": stamp({}, "ingest_data")
             }
+            yield target_topic, payload, read_done
 
-            try:
-                p.produce(
-                    target_topic,
-                    key=unique_id,
-                    value=json.dumps(payload).encode('utf-8'),
-                    callback=delivery_report
-                )
-                p.poll(0)
-                total_sent += 1
-            except Exception as e:
-                print(f"Failed to produce {unique_id}: {e}")
+    registry.commit()
 
-    p.flush()
-    
-    # Save both states
-    update_state_file(RESUME_STATE_FILE, resume_id - 1)
-    update_state_file(JOB_STATE_FILE, job_id - 1)
+def ingest_data(files_to_process, skip_known=True):
+    """Sends every record to Kafka, see iter_payloads for skip_known."""
+    from confluent_kafka import Producer
+    p = Producer(KAFKA_CONF)
     
-    print(f"--- Finished. Sent {total_sent} records. ---")
+    total_sent = 0
+    stats = dict()
+    for target_topic, payload, read_done in iter_payloads(files_to_process, skip_known, stats):
+        unique_id = payload["id"]
+        try:
+            p.produce(
+                target_topic,
+                key=unique_id,
+                value=json.dumps(payload).encode('utf-8'),
+                callback=delivery_report
+            )
+            p.poll(0)
+            total_sent += 1
+            record_stage("ingest_data", unique_id, read_done, time.time(), source=payload["source"])
+        except Exception as e:
+            print(f"Failed to produce {unique_id}: {e}")
+
+    p.flush()
+    print(f"--- Finished. Sent {total_sent} records, skipped {stats['skipped']} already processed. ---")
 
 if __name__ == "__main__":
     MIXED_BATCH = [
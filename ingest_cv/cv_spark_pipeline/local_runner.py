@@ -0,0 +1,265 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(parent_dir, ".."))
+for path in (project_root, parent_dir, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from content_registry import content_hash
+from cv_spark_consumer import Config, buffer_record, empty_buffers
+from cv_spark_producer import RAW_TOPICS, iter_payloads
+from pipeline_metrics import record_metric
+from pipeline_supervisor import touch_heartbeat
+
+# LOCAL RUNNER: the ETL and the consumer in one process pool, without Spark or the Kafka package.
+# Reads the raw payloads from Kafka or straight from the files, parses them with the routing of
+# the ETL in warm worker processes and writes the consumer's output_cv_processing layout.
+
+# --- CONFIGURATION ---
+RUNNER_GROUP_ID = "local_etl_runner"
+CHUNK_ROWS = 64             # documents per task, as the ETL's Arrow batches
+FLUSH_ROWS = 1000           # documents parsed between two writes of the outputs
+IDLE_TIMEOUT = 10.0         # Kafka mode: stop after this many seconds without a message
+WAIT_POLL_INTERVAL = 1.0    # Kafka mode: seconds between two polls while a batch is parsed
+
+# buffer of the consumer -> output folder
+OUTPUT_FOLDERS = {
+    'schema_cv': "schema_cv", 'text_cv': "text_cv", 'info_cv': "info_cv",
+    'schema_job': "job_schema", 'text_job': "job_text",
+}
+
+
+def _arrow_schemas():
+    """Same columns as the consumer's Spark schemas."""
+    import pyarrow as pa
+    def strings(*names):
+        return pa.schema([(name, pa.string()) for name in names])
+    text = pa.schema([("id", pa.string()), ("source", pa.string()), ("text", pa.string()),
+                      ("text_length", pa.int32())])
+    return {
+        'schema_cv': strings("id", "source", "education", "experience", "skills"),
+        'text_cv': text,
+        'info_cv': strings("id", "source", "name", "email", "linkedin"),
+        'schema_job': strings("id", "source", "title", "company", "description", "skills"),
+        'text_job': text,
+    }
+
+
+# --- WORKERS ---
+def _init_worker(threads, parsers):
+    # before any model is built: torch reads these when it is imported in this process
+    from cv_processing.model_registry import preload, thread_env
+    os.environ.update(thread_env(threads))
+    preload(parsers)
+
+def parse_chunk(docs):
+    from cv_spark_ingestion import parse_documents
+    return parse_documents(docs, stage="local_runner")
+
+
+# --- OUTPUTS ---
+def output_records(result):
+    """The (topic, value) records the ETL writes to Kafka for a parsed document."""
+    def record(topic, field, alias):
+        return topic, {"id": result["id"], alias: result[field], "source": result["source"]}
+    if result["is_job"] == "True":
+        return [record("processed_schema_job", "schema_json", "schema"),
+                record("processed_text_job", "text_output", "text")]
+    return [record("processed_schema_cv", "schema_json", "schema"),
+            record("processed_text_cv", "text_output", "text"),
+            record("processed_personal_info_cv", "personal_info", "info")]
+
+def write_buffers(buffers, output_dir=Config.OUTPUT_DIR):
+    """Appends the buffers to output_dir/<folder>/id=<id>/, like the consumer's partitionBy("id")."""
+    import uuid
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from scores.feature_store import write_features
+
+    schemas = _arrow_schemas()
+    for name, folder in OUTPUT_FOLDERS.items():
+        rows = buffers[name]
+        if not rows:
+            continue
+        table = pa.Table.from_pylist(rows, schema=schemas[name])
+        pq.write_to_dataset(table, os.path.join(output_dir, folder), partition_cols=["id"],
+                            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet")
+        print(f"✓ Saved {len(rows)} records to {folder}")
+    for category in ('cv', 'job'):
+        try:
+            write_features(category, buffers[f'features_{category}'])
+        except Exception as e:
+            print(f"Error writing {category} features: {e}")
+
+
+# --- INPUTS ---
+def file_payloads(files_to_process, skip_known=True):
+    """Payloads of the files, with the ids and the registry handling of the producer."""
+    stats = dict()
+    for _, payload, _ in iter_payloads(files_to_process, skip_known, stats):
+        yield payload
+    print(f"{stats['skipped']} records skipped, already processed")
+
+def kafka_payloads(consumer, idle_timeout=IDLE_TIMEOUT):
+    """Payloads of the raw topics until they stay idle for idle_timeout."""
+    last_message = time.time()
+    while time.time() - last_message < idle_timeout:
+        msg = consumer.poll(timeout=1.0)
+        touch_heartbeat()
+        if msg is None or msg.error():
+            continue
+        yield json.loads(msg.value().decode('utf-8'))
+        # the caller may have parsed a whole batch before asking for the next payload:
+        # only the time spent waiting on Kafka counts as idle
+        last_message = time.time()
+
+class PausedConsumer:
+    """Keeps the consumer in its group while a batch is parsed: max.poll.interval.ms counts from
+    the last poll, and a batch of flush_rows documents can take longer on the pool. The
+    assignment is paused and polled (no message comes back) until the batch is committed."""
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+
+    def pause(self):
+        self.consumer.pause(self.consumer.assignment())
+
+    def keep_alive(self):
+        # partitions assigned by a rebalance during the batch are not paused yet
+        self.pause()
+        msg = self.consumer.poll(0)
+        if msg is not None and not msg.error():
+            from confluent_kafka import TopicPartition
+            # read it again once the batch is committed
+            self.consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+
+    def commit_and_resume(self):
+        self.consumer.commit(asynchronous=False)
+        self.consumer.resume(self.consumer.assignment())
+
+def _as_doc(payload):
+    """A payload as a row of the ETL's input: raw_data is a string, the hash is never missing."""
+    doc = dict(payload)
+    if not isinstance(doc["raw_data"], str):
+        doc["raw_data"] = json.dumps(doc["raw_data"])
+    doc.setdefault("category", None)
+    doc["content_hash"] = doc.get("content_hash") or content_hash(doc["raw_data"])
+    return doc
+
+
+# --- RUNNER ---
+def _batches(payloads, size):
+    batch = []
+    for payload in payloads:
+        batch.append(_as_doc(payload))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _imap(pool, func, items, on_wait=None, interval=WAIT_POLL_INTERVAL):
+    """pool.imap, calling on_wait every `interval` seconds spent waiting for a result."""
+    results = pool.imap(func, items)
+    if on_wait is None:
+        yield from results
+        return
+    for _ in items:
+        while True:
+            try:
+                yield results.next(timeout=interval)
+                break
+            except multiprocessing.TimeoutError:
+                on_wait()
+
+def run_local(payloads, workers=4, chunk_rows=CHUNK_ROWS, flush_rows=FLUSH_ROWS, on_batch=None,
+              on_flush=None, on_wait=None, parsers=("nlp",), output_dir=Config.OUTPUT_DIR):
+    """Parses the payloads over `workers` processes and writes the outputs every flush_rows
+    documents. on_batch is called before a batch is parsed, on_wait while it is parsed
+    (e.g. to poll Kafka), on_flush after its outputs are written (e.g. to commit the offsets)."""
+    from download_model import model_validator
+    from cv_processing.model_registry import threads_per_worker
+
+    model_validator()
+    # spawn: the Kafka consumer and the registry connection of this process must not cross a fork
+    ctx = multiprocessing.get_context("spawn")
+    threads = threads_per_worker(workers)
+    print(f"--- Local runner | {workers} workers x {threads} torch threads ---")
+
+    totals = {"parsed": 0, "errors": 0}
+    start = time.time()
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(threads, parsers)) as pool:
+        for batch in _batches(payloads, flush_rows):
+            batch_start = time.time()
+            if on_batch is not None:
+                on_batch()
+            chunks = [batch[i:i + chunk_rows] for i in range(0, len(batch), chunk_rows)]
+            buffers = empty_buffers()
+            for results in _imap(pool, parse_chunk, chunks, on_wait):
+                for result in results:
+                    # same filter as the ETL before its Kafka write
+                    if result.get("error") or result["is_job"] not in ("True", "False"):
+                        totals["errors"] += 1
+                        continue
+                    totals["parsed"] += 1
+                    for topic, value in output_records(result):
+                        buffer_record(buffers, topic, result["id"], value)
+            write_buffers(buffers, output_dir)
+            if on_flush is not None:
+                on_flush()
+            record_metric("local_runner_flush", rows=len(batch),
+                          duration_ms=round((time.time() - batch_start) * 1000, 3))
+            touch_heartbeat()
+    print(f"--- Finished. {totals['parsed']} documents parsed, {totals['errors']} failed or skipped, "
+          f"{time.time() - start:.1f}s ---")
+    return totals
+
+def run_from_kafka(workers=4, idle_timeout=IDLE_TIMEOUT, **kwargs):
+    """Drains the raw topics, committing the offsets once the outputs are written."""
+    from confluent_kafka import Consumer
+    consumer = Consumer({'bootstrap.servers': Config.KAFKA_BOOTSTRAP_SERVERS,
+                         'group.id': RUNNER_GROUP_ID,
+                         'auto.offset.reset': 'earliest',
+                         'enable.auto.commit': False})
+    consumer.subscribe(list(RAW_TOPICS))
+    paused = PausedConsumer(consumer)
+    try:
+        return run_local(kafka_payloads(consumer, idle_timeout), workers, on_batch=paused.pause,
+                         on_wait=paused.keep_alive, on_flush=paused.commit_and_resume, **kwargs)
+    finally:
+        consumer.close()
+
+def run_from_files(files_to_process, workers=4, skip_known=True, **kwargs):
+    """Reads the files directly, ids are assigned as by the producer."""
+    from content_registry import get_registry
+    # the workers mark documents processed: the ids registered for a batch must be committed first
+    return run_local(file_payloads(files_to_process, skip_known), workers,
+                     on_batch=get_registry().commit, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Parses raw CVs and jobs in a local process pool, without Spark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--files", default=None,
+                        help='JSON list of {"path", "source", "type", "category"}, as given to the producer; '
+                             'without it the raw Kafka topics are drained')
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--flush-rows", type=int, default=FLUSH_ROWS)
+    parser.add_argument("--no-skip-known", action="store_true", help="parse content already processed again")
+    parser.add_argument("--preload", default="nlp", help="model parsers loaded when a worker starts")
+    args = parser.parse_args()
+    options = dict(chunk_rows=args.chunk_rows, flush_rows=args.flush_rows,
+                   parsers=tuple(p for p in args.preload.split(",") if p))
+    if args.files:
+        with open(args.files) as f:
+            run_from_files(json.load(f), args.workers, not args.no_skip_known, **options)
+    else:
+        run_from_kafka(args.workers, args.idle_timeout, **options)
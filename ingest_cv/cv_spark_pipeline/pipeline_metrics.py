@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+from pipeline_trace import append_jsonl
+
+# --- CONFIGURATION ---
+# per-batch numbers of the ETL queries and of the consumer flushes, one JSON record per line
+METRICS_FILE = os.environ.get(
+    "CV_METRICS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_metrics.jsonl")
+)
+METRICS_ENABLED = os.environ.get("CV_METRICS_ENABLED", "1") != "0"
+
+
+def record_metric(kind, **fields):
+    if not METRICS_ENABLED:
+        return
+    record = {"kind": kind, "time": time.time(), "pid": os.getpid()}
+    record.update(fields)
+    append_jsonl(METRICS_FILE, record)
+
+
+# --- SPARK STREAMING ---
+def progress_metrics(progress):
+    """The fields worth keeping of a StreamingQueryProgress (as parsed from its json)."""
+    duration = progress.get("durationMs", {})
+    states = progress.get("stateOperators", [])
+    return {
+        "query": progress.get("name"),
+        "batch_id": progress.get("batchId"),
+        "input_rows": progress.get("numInputRows"),
+        "input_rows_per_second": progress.get("inputRowsPerSecond"),
+        "processed_rows_per_second": progress.get("processedRowsPerSecond"),
+        "batch_ms": duration.get("triggerExecution"),
+        "add_batch_ms": duration.get("addBatch"),
+        "get_batch_ms": duration.get("getBatch"),
+        "state_rows": sum(s.get("numRowsTotal", 0) for s in states),
+        "state_memory_bytes": sum(s.get("memoryUsedBytes", 0) for s in states),
+        "state_rows_dropped_by_watermark": sum(s.get("numRowsDroppedByWatermark", 0) for s in states),
+    }
+
+def make_listener():
+    """StreamingQueryListener writing every query progress to METRICS_FILE (pyspark is imported here)."""
+    from pyspark.sql.streaming import StreamingQueryListener
+
+    class MetricsListener(StreamingQueryListener):
+        def onQueryStarted(self, event):
+            record_metric("query_started", query=event.name, run_id=str(event.runId))
+
+        def onQueryProgress(self, event):
+            record_metric("query_progress", **progress_metrics(json.loads(event.progress.json)))
+
+        def onQueryIdle(self, event):
+            pass
+
+        def onQueryTerminated(self, event):
+            record_metric("query_terminated", run_id=str(event.runId), exception=event.exception)
+
+    return MetricsListener()
+
+
+# --- CONSUMER ---
+class FlushMetrics:
+    """Poll lag and flush numbers of the consumer, written once per flush."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def polled(self, msg):
+        # Kafka timestamp of the message (produce or log-append time) -> time it waited to be polled
+        ts_type, ts_ms = msg.timestamp()
+        self.messages += 1
+        if ts_ms and ts_ms > 0:
+            lag = time.time() - ts_ms / 1000
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def flushed(self, sizes, start, end, reason):
+        record_metric(
+            "consumer_flush", reason=reason, rows=sizes, total_rows=sum(sizes.values()),
+            flush_ms=round((end - start) * 1000, 3), messages=self.messages,
+            poll_lag_mean_s=round(self.lag_total / self.messages, 3) if self.messages else None,
+            poll_lag_max_s=round(self.lag_max, 3),
+        )
+        self.reset()
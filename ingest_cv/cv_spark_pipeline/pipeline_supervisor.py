@@ -0,0 +1,240 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# --- CONFIGURATION ---
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(PIPELINE_DIR, "..", ".."))
+ETL_SCRIPT = os.path.join(PIPELINE_DIR, "cv_spark_ingestion.py")
+CONSUMER_SCRIPT = os.path.join(PIPELINE_DIR, "cv_spark_consumer.py")
+RUN_DIR = os.path.join(PIPELINE_DIR, "supervisor_run")
+PID_FILE = os.path.join(RUN_DIR, "supervisor.pid")
+
+HEARTBEAT_ENV = "CV_HEARTBEAT_FILE"
+WRITER_ENV = "CV_WRITER_ID"        # names the private output path of a consumer
+
+@dataclass
+class SupervisorConfig:
+    ETL_WORKERS: int = 1
+    CONSUMER_WORKERS: int = 1
+    ETL_CORES: int = 4                 # local[N] threads of each ETL worker
+    KAFKA_PARTITIONS: int = 1          # partitions of each raw topic, split among ETL workers
+    TORCH_THREADS: int = 0             # per ETL Python worker, 0 = the machine's cores shared by every task slot
+    HEALTH_INTERVAL: float = 5.0
+    HEARTBEAT_TIMEOUT: float = 300.0   # a worker silent for this long is restarted
+    STARTUP_GRACE: float = 120.0       # Spark and the models need time before the first heartbeat
+    MAX_RESTARTS: int = 5              # per worker, within RESTART_WINDOW
+    RESTART_WINDOW: float = 600.0
+    BACKOFF_BASE: float = 2.0
+    BACKOFF_MAX: float = 60.0
+    DRAIN_TIMEOUT: float = 120.0
+
+
+def touch_heartbeat():
+    """Called by workers from their main loop. No-op when not supervised."""
+    path = os.environ.get(HEARTBEAT_ENV)
+    if not path:
+        return
+    with open(path, "a"):
+        os.utime(path, None)
+
+def writer_id():
+    """The worker name when supervised: a restarted consumer takes over its own path."""
+    return os.environ.get(WRITER_ENV) or f"consumer_{os.getpid()}"
+
+
+@dataclass
+class Worker:
+    name: str
+    args: List[str]
+    process: Optional[subprocess.Popen] = None
+    started_at: float = 0.0
+    restarts: List[float] = field(default_factory=list)
+    next_start: float = 0.0
+    failed: bool = False
+
+    @property
+    def heartbeat_file(self):
+        return os.path.join(RUN_DIR, f"{self.name}.heartbeat")
+
+    @property
+    def log_file(self):
+        return os.path.join(RUN_DIR, f"{self.name}.log")
+
+
+class Supervisor:
+    """Runs the ETL and consumer workers as headless child processes, restarts them when they
+    die or stop sending heartbeats, and drains them on shutdown."""
+
+    def __init__(self, config: SupervisorConfig = SupervisorConfig()):
+        self.config = config
+        self.workers = self._build_workers()
+        self.stopping = threading.Event()
+
+    def _build_workers(self):
+        python_exe = sys.executable
+        workers = []
+        for i in range(self.config.ETL_WORKERS):
+            workers.append(Worker(f"etl_{i}", [
+                python_exe, ETL_SCRIPT,
+                "--num-workers", str(self.config.ETL_CORES),
+                "--worker-index", str(i),
+                "--worker-count", str(self.config.ETL_WORKERS),
+                "--partitions", str(self.config.KAFKA_PARTITIONS),
+                "--torch-threads", str(self.config.TORCH_THREADS),
+            ]))
+        for i in range(self.config.CONSUMER_WORKERS):
+            # consumers share the same group id, Kafka splits the partitions among them
+            workers.append(Worker(f"consumer_{i}", [python_exe, CONSUMER_SCRIPT]))
+        return workers
+
+    # --- PROCESS MANAGEMENT ---
+    def _start(self, worker: Worker):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [PROJECT_ROOT] + [p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p]
+        )
+        env[HEARTBEAT_ENV] = worker.heartbeat_file
+        env[WRITER_ENV] = worker.name
+        if os.path.exists(worker.heartbeat_file):
+            os.remove(worker.heartbeat_file)
+        log = open(worker.log_file, "a")
+        worker.process = subprocess.Popen(
+            worker.args, cwd=PIPELINE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            # own process group: a Ctrl+C on the supervisor is not delivered twice
+            start_new_session=True
+        )
+        log.close()
+        worker.started_at = time.time()
+        print(f"[supervisor] started {worker.name} (pid {worker.process.pid}), log: {worker.log_file}")
+
+    def _is_healthy(self, worker: Worker):
+        if worker.process.poll() is not None:
+            print(f"[supervisor] {worker.name} exited with code {worker.process.returncode}")
+            return False
+        now = time.time()
+        if now - worker.started_at < self.config.STARTUP_GRACE:
+            return True
+        if not os.path.exists(worker.heartbeat_file):
+            last_beat = worker.started_at
+        else:
+            last_beat = os.path.getmtime(worker.heartbeat_file)
+        if now - last_beat > self.config.HEARTBEAT_TIMEOUT:
+            print(f"[supervisor] {worker.name} missed its heartbeat for {now - last_beat:.0f}s")
+            return False
+        return True
+
+    def _schedule_restart(self, worker: Worker):
+        now = time.time()
+        worker.restarts = [t for t in worker.restarts if now - t < self.config.RESTART_WINDOW]
+        if len(worker.restarts) >= self.config.MAX_RESTARTS:
+            print(f"[supervisor] {worker.name} restarted {len(worker.restarts)} times in "
+                  f"{self.config.RESTART_WINDOW:.0f}s, giving up on it")
+            worker.failed = True
+            return
+        delay = min(self.config.BACKOFF_MAX, self.config.BACKOFF_BASE ** len(worker.restarts))
+        worker.restarts.append(now)
+        worker.next_start = now + delay
+        print(f"[supervisor] restarting {worker.name} in {delay:.0f}s")
+
+    def _stop(self, worker: Worker, timeout):
+        """SIGINT first: the consumer flushes its buffers and the ETL finishes its batch."""
+        if worker.process is None or worker.process.poll() is not None:
+            return
+        worker.process.send_signal(signal.SIGINT)
+        try:
+            worker.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            print(f"[supervisor] {worker.name} did not drain in {timeout:.0f}s, killing it")
+            worker.process.kill()
+            worker.process.wait()
+
+    def check(self):
+        """One health-check round."""
+        for worker in self.workers:
+            if worker.failed:
+                continue
+            if worker.process is None:
+                if time.time() >= worker.next_start:
+                    self._start(worker)
+            elif not self._is_healthy(worker):
+                self._stop(worker, timeout=10)
+                worker.process = None
+                self._schedule_restart(worker)
+
+    def drain(self):
+        """Stops the ETL workers first so nothing new reaches the consumers, then the consumers."""
+        print("[supervisor] draining workers...")
+        for prefix in ("etl_", "consumer_"):
+            group = [w for w in self.workers if w.name.startswith(prefix)]
+            threads = [threading.Thread(target=self._stop, args=(w, self.config.DRAIN_TIMEOUT)) for w in group]
+            for t in threads: t.start()
+            for t in threads: t.join()
+        print("[supervisor] all workers stopped")
+
+    def request_stop(self, *_):
+        self.stopping.set()
+
+    def run(self):
+        os.makedirs(RUN_DIR, exist_ok=True)
+        with open(PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        try:
+            while not self.stopping.is_set():
+                self.check()
+                if all(w.failed for w in self.workers):
+                    print("[supervisor] every worker failed, stopping")
+                    break
+                self.stopping.wait(self.config.HEALTH_INTERVAL)
+        finally:
+            self.drain()
+            if os.path.exists(PID_FILE):
+                os.remove(PID_FILE)
+
+
+def supervisor_running():
+    """True if a supervisor started from this folder is alive."""
+    if not os.path.exists(PID_FILE):
+        return False
+    try:
+        with open(PID_FILE) as f:
+            os.kill(int(f.read().strip()), 0)
+        return True
+    except (ValueError, ProcessLookupError, PermissionError):
+        return False
+
+def start_detached(etl_workers=1, consumer_workers=1):
+    """Starts the supervisor in the background, it keeps running after the caller exits."""
+    os.makedirs(RUN_DIR, exist_ok=True)
+    log = open(os.path.join(RUN_DIR, "supervisor.log"), "a")
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__),
+         "--etl-workers", str(etl_workers), "--consumer-workers", str(consumer_workers)],
+        cwd=PIPELINE_DIR, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    log.close()
+    print(f"Pipeline workers started in the background, logs in {RUN_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless supervisor for the ETL and consumer workers")
+    parser.add_argument("--etl-workers", type=int, default=SupervisorConfig.ETL_WORKERS)
+    parser.add_argument("--consumer-workers", type=int, default=SupervisorConfig.CONSUMER_WORKERS)
+    parser.add_argument("--etl-cores", type=int, default=SupervisorConfig.ETL_CORES)
+    parser.add_argument("--partitions", type=int, default=SupervisorConfig.KAFKA_PARTITIONS)
+    parser.add_argument("--torch-threads", type=int, default=SupervisorConfig.TORCH_THREADS)
+    args = parser.parse_args()
+    if args.etl_workers > args.partitions:
+        parser.error("each ETL worker needs at least one Kafka partition (--partitions)")
+    Supervisor(SupervisorConfig(
+        ETL_WORKERS=args.etl_workers, CONSUMER_WORKERS=args.consumer_workers,
+        ETL_CORES=args.etl_cores, KAFKA_PARTITIONS=args.partitions, TORCH_THREADS=args.torch_threads
+    )).run()
@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+# every process of the pipeline appends to the same local file
+TRACE_FILE = os.environ.get(
+    "CV_TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_trace.jsonl")
+)
+TRACE_ENABLED = os.environ.get("CV_TRACE_ENABLED", "1") != "0"
+
+_write_lock = threading.Lock()
+
+def append_jsonl(path, record):
+    """Appends one JSON record per line. Small writes in append mode stay whole across processes."""
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+def record_stage(stage, doc_id, start, end, **extra):
+    if not TRACE_ENABLED:
+        return
+    record = {"id": doc_id, "stage": stage, "start": start, "end": end,
+              "duration_ms": round((end - start) * 1000, 3), "pid": os.getpid()}
+    record.update(extra)
+    append_jsonl(TRACE_FILE, record)
+
+def record_wait(stage, doc_id, trace, since):
+    """Records the time spent between the `since` stamp and now (queueing, Kafka hops)."""
+    if trace and since in trace:
+        record_stage(stage, doc_id, float(trace[since]), time.time())
+
+@contextmanager
+def trace_stage(stage, doc_ids=None, **extra):
+    """Times the wrapped block and records it once for every document it handled."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        end = time.time()
+        if isinstance(doc_ids, str) or doc_ids is None:
+            doc_ids = [doc_ids]
+        for doc_id in doc_ids:
+            record_stage(stage, doc_id, start, end, **extra)
+
+def stamp(trace, stage):
+    """Adds the current time under `stage` to a document's trace dictionary."""
+    trace = dict(trace or {})
+    trace[stage] = time.time()
+    return trace
@@ -55,7 +55,7 @@ echo "Kafka is READY!"
 # --- CREAZIONE TOPIC ---
 echo "Creating topics on port $PORT..."
 TOPICS=(
-    "raw_resumes" "json_dataset" "linkedin_pdf" 
+    "raw_resumes" "raw_resumes_models" "json_dataset" "linkedin_pdf" 
     "processed_schema_cv" "processed_text_cv" "processed_personal_info_cv"
 )
 
@@ -27,6 +27,7 @@ echo "Kafka is READY! Creating Topics..."
 # 3. Lista dei Topic
 TOPICS=(
     "raw_resumes"
+    "raw_resumes_models"
     "json_dataset"
     "linkedin_pdf"
     "string_dataset"
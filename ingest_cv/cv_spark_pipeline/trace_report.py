@@ -0,0 +1,62 @@
+import argparse
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from pipeline_trace import TRACE_FILE
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def load_durations(path):
+    durations = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a process killed mid-write can leave a truncated last line
+                continue
+            durations[record["stage"]].append(record["duration_ms"])
+    return durations
+
+def stage_report(durations):
+    """One row per stage: name, count, p50, p95, p99, max (milliseconds)."""
+    rows = []
+    for stage, values in durations.items():
+        values = sorted(values)
+        rows.append([stage, len(values)] + [percentile(values, q) for q in PERCENTILES] + [values[-1]])
+    # slowest stages first, they are the ones worth looking at
+    rows.sort(key=lambda r: r[2 + PERCENTILES.index(95)], reverse=True)
+    return rows
+
+def print_report(path):
+    if not os.path.exists(path):
+        print(f"No trace file found at {path}")
+        return
+    rows = stage_report(load_durations(path))
+    header = ["stage", "count"] + [f"p{q} ms" for q in PERCENTILES] + ["max ms"]
+    width = max([len(header[0])] + [len(r[0]) for r in rows])
+    print(f"{header[0]:<{width}}  " + "  ".join(f"{h:>10}" for h in header[1:]))
+    for row in rows:
+        print(f"{row[0]:<{width}}  {row[1]:>10}  " + "  ".join(f"{v:>10.1f}" for v in row[2:]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency percentiles of the pipeline trace")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    args = parser.parse_args()
+    print_report(args.path)
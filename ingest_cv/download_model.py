@@ -1,10 +1,10 @@
-from huggingface_hub import snapshot_download
 import os
 #nhanv/cv_parser  string
 #facebook/bart-large-mnli  cvs1
 #urchade/gliner_base     cvs2
 # Definiamo dove salvare il modelloc
 def model_downloader(model_name, save_path_name):
+    from huggingface_hub import snapshot_download
     local_model_path = os.path.join(os.getcwd(), f"models/{save_path_name}")
 
     print(f"Inizio download del modello in: {local_model_path}")
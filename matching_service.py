@@ -0,0 +1,262 @@
+import os, sys
+script_path = os.path.abspath(__file__)
+project_root = os.path.dirname(script_path)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import asyncio
+import json
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from run_encoder import load_model, encode_texts, MODEL_PATH
+from faiss_matching import build_index, CV_QUERY_PATH, JOB_PASSAGE_PATH
+from fast_path import fast_ingest_and_match, StoreWriter
+from ingest_cv.cv_spark_pipeline.cv_spark_producer import (
+    reserve_ids, RESUME_STATE_FILE, JOB_STATE_FILE
+)
+
+# --- CONFIGURATION ---
+HOST = "127.0.0.1"
+PORT = 8765
+DEFAULT_K = 10
+
+STORES = {
+    "cv": {"prefix": "A", "embedding_path": CV_QUERY_PATH, "id_column": "cv_id",
+           "schema_path": "cv_datasets/cv_schema", "state_file": RESUME_STATE_FILE},
+    "job": {"prefix": "B", "embedding_path": JOB_PASSAGE_PATH, "id_column": "job_id",
+            "schema_path": "job_datasets/job_schema", "state_file": JOB_STATE_FILE},
+}
+# a cv is matched against jobs and a job against cvs
+OTHER = {"cv": "job", "job": "cv"}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# --- IN-MEMORY STATE ---
+class MatchingService:
+    """Keeps the encoder, the FAISS indexes and the stores warm between requests."""
+
+    def __init__(self, model_path=MODEL_PATH, stores=STORES):
+        self.model = load_model(model_path)
+        self.stores = stores
+        self.lock = threading.Lock()
+        self.embeddings = {}
+        self.texts = {}
+        self.schemas = {}
+        self.indexes = {}
+        self.writer = StoreWriter()
+        for category, conf in stores.items():
+            self._load_category(category, conf)
+
+    def _load_category(self, category, conf):
+        if os.path.exists(conf["embedding_path"]):
+            df = pd.read_parquet(conf["embedding_path"])
+            ids = df[conf["id_column"]].tolist()
+            matrix = np.stack(df["embedding"].tolist()).astype('float32')
+            texts = df["embedding_text"].tolist()
+        else:
+            ids, matrix, texts = [], None, []
+        self.embeddings[category] = {doc_id: matrix[i] for i, doc_id in enumerate(ids)}
+        self.texts[category] = dict(zip(ids, texts))
+        if matrix is not None:
+            self.indexes[category] = build_index(matrix, [int(doc_id[1:]) for doc_id in ids])
+        else:
+            self.indexes[category] = None
+
+        self.schemas[category] = {}
+        if os.path.exists(conf["schema_path"]):
+            with open(conf["schema_path"], "r") as f:
+                for schema in json.load(f):
+                    if "id" in schema:
+                        self.schemas[category][schema["id"]] = schema
+        print(f"{category}: {len(ids)} embeddings and {len(self.schemas[category])} schemas loaded")
+
+    def _check_category(self, category):
+        if category not in self.stores:
+            raise ServiceError(400, f"Unknown category '{category}', use one of {list(self.stores)}")
+
+    def _search(self, query_vec, category, k):
+        """Searches the index of the category opposite to the query's one."""
+        target = OTHER[category]
+        index = self.indexes[target]
+        if index is None:
+            return []
+        prefix = self.stores[target]["prefix"]
+        with self.lock:
+            D, I = index.search(np.asarray(query_vec, dtype='float32').reshape(1, -1), k)
+        matches = []
+        for dist, num_id in zip(D[0], I[0]):
+            if num_id == -1:
+                continue
+            match_id = prefix + str(num_id)
+            matches.append({
+                "match_id": match_id,
+                "match_text": self.texts[target].get(match_id),
+                "match_distance": float(dist)
+            })
+        return matches
+
+    def ingest(self, text, category="cv", schema=None):
+        """Encodes a formatted text, assigns it a new id and adds it to the warm index."""
+        self._check_category(category)
+        conf = self.stores[category]
+        # same side as the store the index was built from: cv queries, job passages
+        embeddings, texts = encode_texts(self.model, [text], is_query=(category == "cv"))
+        # the counter is shared with the producer and the local runner, see reserve_ids
+        num_id = reserve_ids(conf["state_file"])
+        with self.lock:
+            doc_id = conf["prefix"] + str(num_id)
+            vector = embeddings[0].astype('float32')
+            if self.indexes[category] is None:
+                self.indexes[category] = build_index(vector.reshape(1, -1), [num_id])
+            else:
+                self.indexes[category].add_with_ids(vector.reshape(1, -1), np.array([num_id], dtype="int64"))
+            self.embeddings[category][doc_id] = vector
+            self.texts[category][doc_id] = texts[0]
+            if schema is not None:
+                self.schemas[category][doc_id] = schema
+        return doc_id
+
+    def ingest_and_store(self, text, category="cv", schema=None):
+        """ingest(), then the text, schema and vector are written to the stores in the background."""
+        doc_id = self.ingest(text, category, schema)
+        result = {"id": doc_id, "text_output": json.dumps({"text": text, "id": doc_id}), "schema_json": None}
+        if schema is not None:
+            result["schema_json"] = json.dumps(dict(schema, id=doc_id))
+        self.writer.submit(category, result, self.embedding_of(category, doc_id))
+        return doc_id
+
+    def embedding_of(self, category, doc_id):
+        """(vector, embedding text) of a document of the warm index, as stored on disk."""
+        return self.embeddings[category][doc_id], self.texts[category][doc_id]
+
+    def match_id(self, doc_id, k=DEFAULT_K):
+        category = "cv" if doc_id.startswith("A") else "job"
+        vector = self.embeddings[category].get(doc_id)
+        if vector is None:
+            raise ServiceError(404, f"Unknown id '{doc_id}'")
+        return {"anchor": doc_id, "matches": self._search(vector, category, k)}
+
+    def match_text(self, text, category="cv", k=DEFAULT_K):
+        self._check_category(category)
+        # encoded on the same side as ingest(): cv queries, job passages
+        embeddings, texts = encode_texts(self.model, [text], is_query=(category == "cv"))
+        return {"anchor": texts[0], "matches": self._search(embeddings[0], category, k)}
+
+
+# --- HTTP LAYER ---
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    length = int(headers.get("content-length", 0))
+    if length:
+        body = await reader.readexactly(length)
+    return method.upper(), target, body
+
+def _write_response(writer, status, payload):
+    body = json.dumps(payload, default=str).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+def route(service, method, target, body):
+    """Maps a request to the service. Returns a JSON-serialisable payload."""
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    data = json.loads(body) if body else {}
+    k = int(data.get("k", query.get("k", DEFAULT_K)))
+
+    if url.path == "/health" and method == "GET":
+        return {"status": "ok", "documents": {c: len(e) for c, e in service.embeddings.items()}}
+    if url.path == "/ingest" and method == "POST":
+        if not data.get("text"):
+            raise ServiceError(400, "Field 'text' is required")
+        doc_id = service.ingest_and_store(data["text"], data.get("category", "cv"), data.get("schema"))
+        return {"id": doc_id}
+    if url.path == "/upload" and method == "POST":
+        # parse -> format -> encode -> match a file in-process
+        for field in ("path", "source", "type"):
+            if not data.get(field):
+                raise ServiceError(400, f"Field '{field}' is required")
+        return {"results": fast_ingest_and_match(service, data, k, service.writer)}
+    if url.path == "/match" and method == "GET":
+        if "id" not in query:
+            raise ServiceError(400, "Parameter 'id' is required")
+        return service.match_id(query["id"], k)
+    if url.path == "/match" and method == "POST":
+        if data.get("id"):
+            return service.match_id(data["id"], k)
+        if not data.get("text"):
+            raise ServiceError(400, "Field 'id' or 'text' is required")
+        return service.match_text(data["text"], data.get("category", "cv"), k)
+    if url.path in ("/health", "/ingest", "/upload", "/match"):
+        raise ServiceError(405, f"{method} not allowed on {url.path}")
+    raise ServiceError(404, f"No endpoint {url.path}")
+
+async def _handle_client(service, reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        request = await _read_request(reader)
+        if request is None:
+            return
+        try:
+            # encoding and searching are blocking, keep them off the event loop
+            payload = await loop.run_in_executor(None, route, service, *request)
+            _write_response(writer, 200, payload)
+        except ServiceError as e:
+            _write_response(writer, e.status, {"error": e.message})
+        except (ValueError, KeyError) as e:
+            _write_response(writer, 400, {"error": str(e)})
+        except Exception as e:
+            _write_response(writer, 500, {"error": str(e)})
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(service, host=HOST, port=PORT):
+    server = await asyncio.start_server(
+        lambda r, w: _handle_client(service, r, w), host, port)
+    print(f"Matching service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def run_service(host=HOST, port=PORT, model_path=MODEL_PATH):
+    service = MatchingService(model_path)
+    try:
+        asyncio.run(serve(service, host, port))
+    except KeyboardInterrupt:
+        print("Matching service stopped")
+    finally:
+        service.writer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local matching service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+    run_service(args.host, args.port, args.model)
@@ -5,11 +5,7 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from give_inputs import give_inputs, select_integer
 from run_encoder import encoder
-from ingest_cv.cv_spark_pipeline.cv_spark_producer import ingest_data
-import subprocess
-from ingest_cv.cv_spark_pipeline.cv_spark_ingestion import run_spark_etl
-from ingest_cv.cv_spark_pipeline.cv_spark_consumer import run_consumer
-from faiss_matching import matching
+from ingest_cv.cv_spark_pipeline.pipeline_supervisor import supervisor_running, start_detached
 import json
 import numpy as np
 import pandas as pd
@@ -19,30 +15,16 @@ BATCH = [
     {"path": "ingest_cv/Resume.csv", "source": "string_dataset", "type": "csv", "col" : "Resume_str"}
 ]
 
-import subprocess
-import platform
-import sys
-import os
-
-def run_in_terminal(script_name):
-    os_name = platform.system().lower()
-    python_exe = sys.executable
-    if os_name == 'windows':
-        subprocess.Popen(['start', 'cmd', '/k', f'"{python_exe}" {script_name}'], shell=True)  
-    elif os_name == 'linux':
-        try:
-            subprocess.Popen(['gnome-terminal', '--', python_exe, script_name])
-        except FileNotFoundError:
-            subprocess.Popen(['xterm', '-e', python_exe, script_name])     
-    elif os_name == 'darwin':
-        script_path = os.path.abspath(script_name)
-        command = f'tell application "Terminal" to do script "{python_exe} {script_path}"'
-        subprocess.Popen(['osascript', '-e', command])
-        
-    else:
-        print(f"Sistema operativo {os_name} non supportato.")
-
-
+# derives the scoring features once, so reranking reads them instead of recomputing them
+def write_schema_features(category, records):
+    from scores.feature_store import DERIVE, write_features
+    rows = []
+    for record in records:
+        schema = record.get("schema", record)
+        if isinstance(schema, str):
+            schema = json.loads(schema)
+        rows.append(DERIVE[category](schema, record.get("id")))
+    write_features(category, rows)
 
 # runs for the first time with all the datasets to build up the database
 def order():
@@ -91,6 +73,7 @@ def order():
                             cv_schema.append(data)
     with open("cv_datasets/cv_schema", "w") as f:
         json.dump(cv_schema,f)
+    write_schema_features("cv", cv_schema)
 
     #collects all the processed personal infos and saves the personal info database
     
@@ -126,6 +109,7 @@ def order():
                             job_schema.append(data)
     with open("job_datasets/job_schema", "w") as f:
         json.dump(job_schema,f)
+    write_schema_features("job", job_schema)
     
     job_text_elements = os.listdir(job_text_path)
     data_frames = []
@@ -151,25 +135,17 @@ def order():
     print("The full datasets can be found in the folder job_datasets")
 
 def main():
-    spark_etl_script = "ingest_cv/cv_spark_pipeline/cv_spark_ingestion.py"
-    consumer_script = "ingest_cv/cv_spark_pipeline/cv_spark_consumer.py"
+    # heavy dependencies (confluent_kafka, faiss) are imported only by the commands that use them
+    from ingest_cv.cv_spark_pipeline.cv_spark_producer import ingest_data
+    from faiss_matching import matching
 
     # ETL pipeline for the newly added file
     inputs, query_with_cv = give_inputs()
     print("Pipeline starting...")
     ingest_data(inputs)
-    print("Please, open your Spark Streaming terminals. Are they still open?")
-    while(True):
-        terminal = input("Yes [Y] or no [N]?")
-        terminal = terminal.lower()
-        if terminal == "n":
-            print("If one is still open, please close it. They will both be restarted")
-            run_in_terminal(spark_etl_script)
-            run_in_terminal(consumer_script)
-        if terminal != 'n' and terminal != 'y':
-            print("Invalid input")
-        else:
-            break
+    # the supervisor keeps the Spark ETL and the consumer alive, headless
+    if not supervisor_running():
+        start_detached()
     # finds the most recent resume and adds it to the databases
     # loads the existing databases
     database_text = pd.read_parquet("cv_datasets/cv_text")
@@ -273,6 +249,25 @@ def main():
     print("TOP MATCHES FOUND:")
     print(match_df.head())
     
+# in-process alternative to main(): no Kafka/Spark round-trip, stores are written afterwards
+def fast_main():
+    from matching_service import MatchingService
+    from fast_path import fast_ingest_and_match
+    inputs, query_with_cv = give_inputs()
+    inputs["category"] = "cv" if query_with_cv else "job"
+    k = select_integer()
+    service = MatchingService()
+    try:
+        # the service's own writer, as the /upload route
+        for matches in fast_ingest_and_match(service, inputs, k, service.writer):
+            match_df = pd.DataFrame(matches["matches"], columns=["match_id", "match_text", "match_distance"])
+            match_df = match_df.sort_values("match_distance", ascending=False).reset_index(drop=True)
+            print(f"TOP MATCHES FOUND FOR {matches['anchor']}:")
+            print(match_df.head())
+    finally:
+        # waits for the background store writes before exiting
+        service.writer.close()
+
 if __name__ == "__main__":
     order()
     main()
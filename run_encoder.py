@@ -1,29 +1,41 @@
 import json
 import os
+from ingest_cv.cv_spark_pipeline.pipeline_trace import trace_stage
 
 DIMENSION = 64
-def encoder(input_df, input_type, model_path = f"trained_biencoders/trained_biencoder_2e-05", is_query = True):
+MODEL_PATH = "trained_biencoders/trained_biencoder_2e-05"
+
+def load_model(model_path = MODEL_PATH):
+    """Loads the bi-encoder once, on the best available device."""
+    import torch
+    from sentence_transformers import SentenceTransformer
     device = "cpu"
     if torch.cuda.is_available():
         device = "cuda"
     elif torch.xpu.is_available():
         device = "xpu"
-    from sentence_transformers import SentenceTransformer, util
-    import torch
-    import pandas as pd
-    model_path = f"trained_biencoders/trained_biencoder_2e-05"
-    model = SentenceTransformer(model_path, device = device, truncate_dim=dim)
-    ids = input_df["id"].tolist()
-    texts = input_df["text"].tolist()
+    return SentenceTransformer(model_path, device = device, truncate_dim=DIMENSION)
+
+def encode_texts(model, texts, is_query = True):
+    """Adds the query/passage prefix and returns (embeddings, prefixed texts)."""
     if is_query:
         texts= ["Query: " + text for text in texts]
-        kind = "query"
     else:
         texts = ["Passage: " + text for text in texts]
-        kind = "passage"
     # Generiamo gli embeddings troncati alla dimensione specifica
-    embeddings = model.encode(texts, truncate_dim=DIMENSION, convert_to_tensor=True)
-    diz =  { "id": ids, 
+    embeddings = model.encode(texts, truncate_dim=DIMENSION, convert_to_numpy=True)
+    return embeddings, texts
+
+def encoder(input_df, input_type, model_path = MODEL_PATH, is_query = True, model = None):
+    import pandas as pd
+    if model is None:
+        model = load_model(model_path)
+    ids = input_df["id"].tolist()
+    texts = input_df["text"].tolist()
+    kind = "query" if is_query else "passage"
+    with trace_stage("encoder", ids, input_type=input_type, kind=kind):
+        embeddings, texts = encode_texts(model, texts, is_query)
+    diz =  { "id": ids,
             "embedding":embeddings,
             "text": texts
         }
@@ -43,5 +55,4 @@ def encoder(input_df, input_type, model_path = f"trained_biencoders/trained_bien
         df_final = pd.DataFrame([diz])
 
     df_final.to_parquet(file_path, engine='pyarrow', index=False)
-    
 
@@ -0,0 +1,156 @@
+import argparse
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+import faiss_matching
+from faiss_matching import build_index
+from scores.feature_lookup import get_lookup
+from scores.final_score import rerank_batch
+from scores.occupation_index import load_occupations
+
+# BULK FUNNEL: ranked shortlists for many anchors at once
+# the cosine retrieval is one batched faiss search, the reranking runs in a process pool
+
+RANKINGS_DIR = "rankings"
+RANKING_COLUMNS = ["anchor_id", "rank", "match_id", "score"]
+SEARCH_CHUNK = 4096     # queries per faiss search, bounds the distance matrices in memory
+RERANK_CHUNK = 256      # anchors per pool task
+
+
+def warm_features():
+    #everything the reranking reads; built before the pool forks so the workers share the pages
+    lookup = get_lookup()
+    lookup.skill_matrices()
+    load_occupations()
+    return lookup
+
+def _pool_context():
+    #fork shares the warm read-only tables copy-on-write, spawn workers rebuild them once
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+# --- CANDIDATE RETRIEVAL ---
+
+def retrieve_candidates(anchor_ids, k=50, from_job_to_cv=True):
+    #returns {anchor_id: (candidate_ids, cosine_scores)}, anchors without an embedding are left out
+    faiss_matching.load_stores()
+    if from_job_to_cv:
+        anchor_text = faiss_matching.job_id_to_text_query
+        anchor_vectors = faiss_matching.job_query_lookup
+        store, id_column, prefix = faiss_matching.df_cv_passage, "cv_id", "A"
+    else:
+        anchor_text = faiss_matching.cv_id_to_text_query
+        anchor_vectors = faiss_matching.cv_query_lookup
+        store, id_column, prefix = faiss_matching.df_job_passage, "job_id", "B"
+
+    matrix = np.stack(store["embedding"].tolist()).astype('float32')
+    index = build_index(matrix, store[id_column].str[1:].astype("int64"))
+
+    found = [a for a in anchor_ids if anchor_text.get(a) in anchor_vectors]
+    if len(found) < len(anchor_ids):
+        print(f"{len(anchor_ids) - len(found)} ids have no embedding and are skipped")
+
+    candidates = dict()
+    for start in range(0, len(found), SEARCH_CHUNK):
+        chunk = found[start:start + SEARCH_CHUNK]
+        query_vec = np.stack([anchor_vectors[anchor_text[a]] for a in chunk]).astype('float32')
+        D, I = index.search(query_vec, k)
+        for anchor_id, dists, ids in zip(chunk, D, I):
+            keep = ids != -1
+            candidates[anchor_id] = ([prefix + str(i) for i in ids[keep]], dists[keep])
+    return candidates
+
+
+# --- PARALLEL RERANKING ---
+
+def _rerank_chunk(task):
+    #returns the ranking rows, the anchors and the candidates missing from the feature tables;
+    #a missing candidate is left out of its anchor's shortlist, the others are still ranked
+    from_job_to_cv, n, chunk = task
+    lookup = get_lookup()
+    anchor_rows, candidate_rows = (lookup.job_row, lookup.cv_row) if from_job_to_cv else (lookup.cv_row, lookup.job_row)
+    rows = []
+    missing_anchors, missing_candidates = set(), set()
+    for anchor_id, candidate_ids, cosine_scores in chunk:
+        if anchor_id not in anchor_rows:
+            missing_anchors.add(anchor_id)
+            continue
+        known = [i for i, c in enumerate(candidate_ids) if c in candidate_rows]
+        if len(known) < len(candidate_ids):
+            missing_candidates.update(c for c in candidate_ids if c not in candidate_rows)
+            candidate_ids = [candidate_ids[i] for i in known]
+            cosine_scores = np.asarray(cosine_scores)[known]
+        ranked = rerank_batch(anchor_id, candidate_ids, cosine_scores, n=n, from_job_to_cv=from_job_to_cv)
+        for rank, (match_id, score) in enumerate(ranked, start=1):
+            rows.append((anchor_id, rank, match_id, score))
+    return rows, missing_anchors, missing_candidates
+
+def bulk_funneling(anchor_ids, k=50, n=None, from_job_to_cv=True, out_path=None, workers=None):
+    anchor_ids = list(dict.fromkeys(anchor_ids))
+    if out_path is None:
+        out_path = os.path.join(RANKINGS_DIR, "cvs_for_jobs.parquet" if from_job_to_cv else "jobs_for_cvs.parquet")
+    workers = workers or os.cpu_count() or 1
+
+    candidates = retrieve_candidates(anchor_ids, k, from_job_to_cv)
+    items = [(a, *candidates[a]) for a in anchor_ids if a in candidates]
+    tasks = [(from_job_to_cv, n, items[i:i + RERANK_CHUNK]) for i in range(0, len(items), RERANK_CHUNK)]
+
+    warm_features()
+    rows = []
+    missing_anchors, missing_candidates = set(), set()
+    if workers == 1 or len(tasks) <= 1:
+        results = map(_rerank_chunk, tasks)
+        for chunk_rows, chunk_anchors, chunk_candidates in results:
+            rows.extend(chunk_rows)
+            missing_anchors |= chunk_anchors
+            missing_candidates |= chunk_candidates
+    else:
+        with _pool_context().Pool(workers, initializer=warm_features) as pool:
+            for chunk_rows, chunk_anchors, chunk_candidates in pool.imap(_rerank_chunk, tasks):
+                rows.extend(chunk_rows)
+                missing_anchors |= chunk_anchors
+                missing_candidates |= chunk_candidates
+    skipped = len(missing_anchors)
+    if missing_anchors:
+        print(f"{skipped} anchors are missing from the feature tables and are skipped: "
+              f"{sorted(missing_anchors)[:10]}")
+    if missing_candidates:
+        print(f"{len(missing_candidates)} candidates are missing from the feature tables and are left "
+              f"out of the shortlists: {sorted(missing_candidates)[:10]}")
+
+    rankings = pd.DataFrame(rows, columns=RANKING_COLUMNS)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    rankings.to_parquet(out_path, index=False)
+    print(f"{len(items) - skipped} shortlists written to {out_path}")
+    return out_path
+
+def bulk_funneling_cvs_ranked(job_ids, k=50, n=None, out_path=None, workers=None):
+    #funneling_cvs_ranked for every job id, one row per (job, ranked cv)
+    return bulk_funneling(job_ids, k, n, True, out_path, workers)
+
+def bulk_funneling_postings_ranked(cv_ids, k=50, n=None, out_path=None, workers=None):
+    #funneling_postings_ranked for every cv id, one row per (cv, ranked job)
+    return bulk_funneling(cv_ids, k, n, False, out_path, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranked shortlists for many jobs (or cvs) written to parquet")
+    parser.add_argument("--postings", action="store_true", help="rank jobs for cvs instead of cvs for jobs")
+    parser.add_argument("--ids", nargs="*", help="anchor ids, every id in the query store if omitted")
+    parser.add_argument("-k", type=int, default=50, help="candidates retrieved per anchor")
+    parser.add_argument("-n", type=int, default=None, help="candidates kept per anchor after reranking")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    ids = args.ids
+    if not ids:
+        faiss_matching.load_stores()
+        store = faiss_matching.df_cv_query if args.postings else faiss_matching.df_job_query
+        ids = store["cv_id" if args.postings else "job_id"].tolist()
+    bulk_funneling(ids, args.k, args.n, not args.postings, args.out, args.workers)
@@ -0,0 +1,200 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_job_metadata_pandas
+from ingest_cv.cv_processing.cv_formatting import UNKNOWN_LEVEL, seniority_level
+from scores.occupation_index import groups_of, normalize_label
+
+CV_DATASET_PATH = "extraction/full_resume_dataset.json"
+
+
+def _as_list(value):
+    #parquet/json may give arrays, None or NaN instead of lists
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+def _as_levels(values):
+    #integer seniority per row, UNKNOWN_LEVEL where missing
+    return pd.to_numeric(pd.Series(values), errors="coerce").fillna(UNKNOWN_LEVEL).to_numpy(dtype=np.int64)
+
+def _levels_from_experience(values):
+    levels = []
+    for exp in values:
+        try:
+            levels.append(seniority_level(int(exp)))
+        except (TypeError, ValueError):
+            levels.append(UNKNOWN_LEVEL)
+    return np.array(levels, dtype=np.int64)
+
+
+class FeatureLookup:
+    # id -> row indexes and the per-id features used by the scores modules
+    # built once, so scoring a candidate is a dict lookup instead of a full DataFrame scan
+
+    def __init__(self, job_df, cv_df):
+        self.job_ids = job_df["job_id"].tolist()
+        self.cv_ids = cv_df["resume_id"].tolist()
+
+        #first occurrence wins, as .values[0] did on the filtered frames
+        self.job_row = {}
+        for i, job_id in enumerate(self.job_ids):
+            self.job_row.setdefault(job_id, i)
+        self.cv_row = {}
+        for i, cv_id in enumerate(self.cv_ids):
+            self.cv_row.setdefault(cv_id, i)
+
+        self.job_skills = [_as_list(s) for s in job_df["skill_ids"]]
+        self.cv_skills = [_as_list(s) for s in cv_df["skill_ids"]]
+        self.job_titles = job_df["title"].tolist()
+        self.cv_titles = [_as_list(t) for t in cv_df["titles"]]
+        self._skill_matrices = None
+        #integer seniority per row, replaced by the ingest-time levels of the feature store
+        from scores.feature_store import title_seniority
+        self.job_seniority = np.array([title_seniority(t) for t in self.job_titles], dtype=np.int64)
+        if "total_experience" in cv_df.columns:
+            self.cv_seniority = _levels_from_experience(cv_df["total_experience"])
+        else:
+            self.cv_seniority = np.full(len(self.cv_ids), UNKNOWN_LEVEL, dtype=np.int64)
+        #filled from the feature store, when the features were derived at ingest time
+        self.title_group_map = None
+
+    @classmethod
+    def from_feature_store(cls, job_features, cv_features):
+        job_df = pd.DataFrame({
+            "job_id": job_features["id"],
+            "skill_ids": job_features["skill_ids"],
+            "title": [(_as_list(t) or [""])[0] for t in job_features["titles"]],
+        })
+        cv_df = pd.DataFrame({
+            "resume_id": cv_features["id"],
+            "skill_ids": cv_features["skill_ids"],
+            "titles": cv_features["titles"],
+        })
+        lookup = cls(job_df, cv_df)
+        lookup.title_group_map = dict()
+        for features in (job_features, cv_features):
+            for titles, groups in zip(features["titles"], features["title_groups"]):
+                for title, title_groups in zip(_as_list(titles), _as_list(groups)):
+                    title_groups = _as_list(title_groups)
+                    #positions written before the groups were keyed by label: recomputed
+                    if all(isinstance(g, str) for g in title_groups):
+                        lookup.title_group_map[normalize_label(title)] = frozenset(title_groups)
+        lookup.job_seniority = _as_levels(job_features["seniority"])
+        lookup.cv_seniority = _as_levels(cv_features["seniority"])
+        return lookup
+
+    def job_skill_ids(self, job_id):
+        return self.job_skills[self.job_row[job_id]]
+
+    def cv_skill_ids(self, cv_id):
+        return self.cv_skills[self.cv_row[cv_id]]
+
+    def skill_matrices(self):
+        #dictionary-encoded skills: CSR binary matrices (jobs x skills, cvs x skills)
+        #over one shared vocabulary, plus the number of distinct skills per row
+        if self._skill_matrices is None:
+            from scipy.sparse import csr_matrix
+            vocabulary = {}
+            matrices = []
+            for skill_lists in (self.job_skills, self.cv_skills):
+                rows, cols = [], []
+                for i, skills in enumerate(skill_lists):
+                    for skill in skills:
+                        rows.append(i)
+                        cols.append(vocabulary.setdefault(skill, len(vocabulary)))
+                matrices.append((rows, cols, len(skill_lists)))
+            built = []
+            for rows, cols, n_rows in matrices:
+                m = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                               shape=(n_rows, len(vocabulary)))
+                m.sum_duplicates()
+                m.data[:] = 1.0 #repeated skills count once, as in a set
+                built.append(m)
+            job_m, cv_m = built
+            self._skill_matrices = (job_m, cv_m, np.diff(job_m.indptr), np.diff(cv_m.indptr))
+        return self._skill_matrices
+
+    def title_groups(self, title):
+        #occupation groups of a title: precomputed at ingest if possible, else from the ESCO index
+        if self.title_group_map is not None:
+            groups = self.title_group_map.get(normalize_label(title))
+            if groups is not None:
+                return groups
+        return groups_of(title)
+
+    def job_levels(self, job_ids):
+        return self.job_seniority[[self.job_row[job_id] for job_id in job_ids]]
+
+    def cv_levels(self, cv_ids):
+        return self.cv_seniority[[self.cv_row[cv_id] for cv_id in cv_ids]]
+
+    def job_title(self, job_id):
+        return self.job_titles[self.job_row[job_id]]
+
+    def cv_title_list(self, cv_id):
+        return self.cv_titles[self.cv_row[cv_id]]
+
+
+def _dataset_features():
+    #the raw datasets in the feature-store layout (no precomputed title groups)
+    from scores.feature_store import title_seniority
+    cv_df = pd.read_json(CV_DATASET_PATH)
+    job_df = load_job_metadata_pandas()
+    job_titles = [_as_list(t) for t in job_df["title"]]
+    jobs = pd.DataFrame({
+        "id": job_df["job_id"],
+        "skill_ids": job_df["skill_ids"],
+        "titles": job_titles,
+        "title_groups": [[] for _ in job_titles],
+        "seniority": [title_seniority((t or [""])[0]) for t in job_titles],
+    })
+    if "total_experience" in cv_df.columns:
+        cv_levels = _levels_from_experience(cv_df["total_experience"])
+    else:
+        cv_levels = np.full(len(cv_df), UNKNOWN_LEVEL, dtype=np.int64)
+    cvs = pd.DataFrame({
+        "id": cv_df["resume_id"],
+        "skill_ids": cv_df["skill_ids"],
+        "titles": cv_df["titles"] if "titles" in cv_df.columns else [[] for _ in range(len(cv_df))],
+        "title_groups": [[] for _ in range(len(cv_df))],
+        "seniority": cv_levels,
+    })
+    return jobs, cvs
+
+def with_store_features(dataset, store, category=""):
+    #titles, title groups and seniority of the store for the ids it covers; the skills stay
+    #the datasets' ones: the store encodes skills by name, the datasets by their own ids, and
+    #jaccard between the two vocabularies would always be 0
+    if store is None:
+        return dataset
+    store = store.drop_duplicates(subset="id", keep="last").set_index("id")
+    covered = dataset["id"].isin(store.index)
+    dataset = dataset.copy()
+    for column in ("titles", "title_groups", "seniority"):
+        dataset[column] = dataset[column].astype(object)
+        dataset.loc[covered, column] = store.loc[dataset.loc[covered, "id"], column].to_numpy()
+    extra = len(set(store.index) - set(dataset["id"]))
+    if extra:
+        print(f"{extra} {category} ids of the feature store are not in the datasets, not scored")
+    return dataset
+
+@functools.lru_cache(maxsize=None)
+def get_lookup():
+    #shared by jaccard, title_analyser and final_score: the datasets are read once per process
+    #skills come from a single source, the datasets if they can be read, else the feature store
+    from scores.feature_store import load_features
+    job_store, cv_store = load_features("job"), load_features("cv")
+    try:
+        job_data, cv_data = _dataset_features()
+    except (FileNotFoundError, ValueError) as e:
+        if job_store is None or cv_store is None:
+            raise
+        print(f"Datasets unavailable ({e}), scoring from the feature store only")
+        return FeatureLookup.from_feature_store(job_store, cv_store)
+    return FeatureLookup.from_feature_store(with_store_features(job_data, job_store, "job"),
+                                            with_store_features(cv_data, cv_store, "cv"))
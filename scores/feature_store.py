@@ -0,0 +1,128 @@
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from ingest_cv.cv_processing.cv_formatting import SENIORITY_LEVELS, UNKNOWN_LEVEL, seniority_level
+from scores.occupation_index import groups_of, normalize_label
+
+# FEATURE STORE: scoring features derived once per document, when it is persisted
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURES_DIR = os.path.join(PROJECT_ROOT, "features")
+# one folder per category, one part file per write: a flush never rewrites the earlier rows
+FEATURE_PATHS = {
+    "cv": os.path.join(FEATURES_DIR, "cv_features"),
+    "job": os.path.join(FEATURES_DIR, "job_features"),
+}
+FEATURE_COLUMNS = ["id", "skill_ids", "titles", "title_groups", "seniority"]
+
+
+def _content(schema):
+    #reprocess_json nests the fields under "schema", the other parsers do not
+    return schema.get("schema", schema) if isinstance(schema, dict) else {}
+
+def _unique(values):
+    return list(dict.fromkeys(v for v in values if v))
+
+def _skill_ids(skills):
+    #skills are dictionary-encoded by name, cv and job skills share the same normalization;
+    #not the vocabulary of the datasets' skill_ids, see feature_lookup.get_lookup
+    return sorted({normalize_label(s) for s in skills or [] if s and str(s).strip()})
+
+def _title_groups(titles):
+    #preferred labels of the occupation groups, stable when the index is rebuilt
+    return [sorted(groups_of(title)) for title in titles]
+
+# title keywords of the posting -> seniority level, checked from the most senior
+TITLE_LEVEL_KEYWORDS = [
+    (5, ("principal", "staff", "lead", "head", "director", "chief")),
+    (4, ("senior", "sr")),
+    (3, ("mid", "intermediate")),
+    (2, ("junior", "jr", "entry", "graduate")),
+    (1, ("intern", "internship", "trainee")),
+]
+
+def title_seniority(title):
+    words = set(normalize_label(title).replace(".", " ").replace("-", " ").split())
+    for level, keywords in TITLE_LEVEL_KEYWORDS:
+        if words.intersection(keywords):
+            return level
+    return UNKNOWN_LEVEL
+
+def job_seniority(content, titles):
+    #explicit seniority field of the job schema if any, else the keywords of the title
+    value = content.get("seniority") or content.get("experience_level")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        level = SENIORITY_LEVELS.get(normalize_label(value)) or title_seniority(value)
+        if level:
+            return level
+    return max((title_seniority(title) for title in titles), default=UNKNOWN_LEVEL)
+
+def derive_cv_features(schema, doc_id=None):
+    content = _content(schema)
+    titles = _unique([content.get("title", "")] + [job.get("title", "") for job in content.get("experience", [])])
+    seniority = UNKNOWN_LEVEL
+    exp = content.get("total_experience")
+    if exp is not None:
+        try:
+            seniority = seniority_level(int(exp))
+        except (TypeError, ValueError):
+            pass
+    return {
+        "id": doc_id or schema.get("id"),
+        "skill_ids": _skill_ids(content.get("skills")),
+        "titles": titles,
+        "title_groups": _title_groups(titles),
+        "seniority": seniority,
+    }
+
+def derive_job_features(schema, doc_id=None):
+    content = _content(schema)
+    skills = content.get("skills")
+    if isinstance(skills, str):
+        skills = [skills]
+    titles = _unique([content.get("title", "")])
+    return {
+        "id": doc_id or schema.get("id"),
+        "skill_ids": _skill_ids(skills),
+        "titles": titles,
+        "title_groups": _title_groups(titles),
+        "seniority": job_seniority(content, titles),
+    }
+
+DERIVE = {"cv": derive_cv_features, "job": derive_job_features}
+
+
+def write_features(category, rows):
+    #writes a new part file; the part is renamed into place once complete, so a crash never
+    #leaves a truncated file and concurrent writers never overwrite each other
+    rows = [r for r in rows if r.get("id")]
+    if not rows:
+        return
+    folder = FEATURE_PATHS[category]
+    os.makedirs(folder, exist_ok=True)
+    #the name sorts by write time: on load, a re-ingested id keeps its latest row
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex}.parquet"
+    tmp_path = os.path.join(folder, f".{name}.tmp")
+    pd.DataFrame(rows, columns=FEATURE_COLUMNS).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(folder, name))
+
+def _parts(folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                  if f.startswith("part-") and f.endswith(".parquet"))
+
+def load_features(category):
+    parts = _parts(FEATURE_PATHS[category])
+    if not parts:
+        return None
+    df = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    return df.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+
+def features_available():
+    return all(_parts(folder) for folder in FEATURE_PATHS.values())
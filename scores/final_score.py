@@ -3,10 +3,20 @@
 # use FAISS to obtain the best k potential matches
 # use the final score to rank them and find the best cv
 
+import heapq
+
 from scores.cosine_distance import recommend_cvs, recommend_jobs, df_job_query # <--- !!! IMPORT DATAFRAME TO GET VALID IDS
-from scores.jaccard import jaccard_similarity
-from scores.title_analyser import title_category, title_similarity
-from scores.years_experience import experience_computer
+import numpy as np
+
+from scores.jaccard import jaccard_similarity, jaccard_batch, jaccard_batch_jobs
+from scores.title_analyser import (
+    title_category, title_similarity,
+    title_category_batch, title_category_batch_jobs,
+    title_category_bound, title_category_bound_jobs,
+    title_similarity_batch, title_similarity_batch_jobs,
+)
+from scores.feature_lookup import get_lookup
+from scores.years_experience import experience_computer, level_gap
 
 alpha = 1.0
 beta = 0.5
@@ -26,7 +36,7 @@ def compute_final_score(cosine_sim, job_id, cv_id, from_job_to_cv = True):
     jaccard_sim = jaccard_similarity(job_id, cv_id)
     title_cat = title_category(job_id, cv_id)
     title_dist = title_similarity(job_id, cv_id)
-    years_gap = experience_computer(job_id, cv_id)
+    years_gap = experience_computer(job_id, cv_id) or 0.0
     final_score = (alpha   * cosine_sim
                  + beta    * jaccard_sim
                  + gamma1  * title_cat
@@ -35,51 +45,115 @@ def compute_final_score(cosine_sim, job_id, cv_id, from_job_to_cv = True):
     )
     return final_score
 
+# BATCH RERANKING: every feature of a candidate list computed as arrays
+
+def dynamic_penalty_batch(gaps, from_job_to_cv):
+    if from_job_to_cv == False:
+        return np.zeros_like(gaps)
+    return np.where(gaps < 0, -0.05, 0.15)
+
+def years_gap_batch(job_ids, cv_ids):
+    #one subtraction over the ingest-time seniority levels, 0 where a level is unknown
+    lookup = get_lookup()
+    return level_gap(lookup.job_levels(job_ids), lookup.cv_levels(cv_ids))
+
+def top_n(ids, scores, n=None):
+    #sorted (id, score) pairs, best first; ties keep the candidate order
+    if n is None or n >= len(scores):
+        idx = np.arange(len(scores))
+    else:
+        #argpartition picks an arbitrary subset of the scores tied at the cutoff:
+        #keep every candidate tied with the n-th score, the lexsort decides, then truncate
+        cutoff = -np.partition(-scores, n - 1)[n - 1]
+        idx = np.flatnonzero(scores >= cutoff)
+    idx = idx[np.lexsort((idx, -scores[idx]))][:n]
+    return [(ids[i], float(scores[i])) for i in idx]
+
+def rerank_batch(anchor_id, candidate_ids, cosine_scores, n=None, from_job_to_cv=True):
+    #the anchor is a job when from_job_to_cv, a cv otherwise; same formula as compute_final_score
+    candidate_ids = list(candidate_ids)
+    if not candidate_ids:
+        return []
+    cosine_scores = np.asarray(cosine_scores, dtype=np.float64)
+    if from_job_to_cv:
+        jaccard_sim = jaccard_batch(anchor_id, candidate_ids)
+        title_cat = title_category_batch(anchor_id, candidate_ids)
+        title_dist = title_similarity_batch(anchor_id, candidate_ids)
+        years_gap = years_gap_batch([anchor_id] * len(candidate_ids), candidate_ids)
+    else:
+        jaccard_sim = jaccard_batch_jobs(anchor_id, candidate_ids)
+        title_cat = title_category_batch_jobs(anchor_id, candidate_ids)
+        title_dist = title_similarity_batch_jobs(anchor_id, candidate_ids)
+        years_gap = years_gap_batch(candidate_ids, [anchor_id] * len(candidate_ids))
+    final_scores = (alpha   * cosine_scores
+                  + beta    * jaccard_sim
+                  + gamma1  * title_cat
+                  + gamma2  * title_dist
+                  - dynamic_penalty_batch(years_gap, from_job_to_cv) * years_gap
+    )
+    return top_n(candidate_ids, final_scores, n)
+
+# ADAPTIVE FUNNEL: candidates pulled in cosine order, stop when none of the rest can enter the top n
+
+ADAPTIVE_STEP = 10
+
+def max_bonus(anchor_id, from_job_to_cv=True):
+    #largest contribution of the non-cosine terms: jaccard <= 1, title_sim <= 1,
+    #the experience term is never positive, title_category is bounded by the group counts
+    if from_job_to_cv:
+        title_cat = title_category_bound(anchor_id)
+    else:
+        title_cat = title_category_bound_jobs(anchor_id)
+    return beta * 1.0 + gamma1 * title_cat + gamma2 * 1.0
+
+def adaptive_funneling(anchor_id, n=1, k=50, step=ADAPTIVE_STEP, from_job_to_cv=True):
+    #same ranking as rerank_batch over the k nearest candidates, scoring only the ones that can still win
+    recommend = recommend_cvs if from_job_to_cv else recommend_jobs
+    bonus = max_bonus(anchor_id, from_job_to_cv)
+    heap = []   # (score, -position, id): the root is the current n-th best
+    scored = 0
+    fetched = []
+    while scored < k:
+        if scored >= len(fetched):
+            #faiss cannot resume a search: ask again with a doubled k, the first results are the same
+            fetched = recommend(anchor_id, k=min(k, max(step, 2 * len(fetched)))) or []
+            if scored >= len(fetched):
+                break
+        block = fetched[scored:scored + step]
+        if len(heap) == n and alpha * block[0][1] + bonus <= heap[0][0]:
+            break
+        ids, cos_sims = zip(*block)
+        scores = dict(rerank_batch(anchor_id, ids, cos_sims, from_job_to_cv=from_job_to_cv))
+        for offset, cand_id in enumerate(ids):
+            item = (scores[cand_id], -(scored + offset), cand_id)
+            if len(heap) < n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        scored += len(block)
+    return [(cand_id, score) for score, _, cand_id in sorted(heap, reverse=True)]
+
 # CV EVALUATION
 
 def funneling_cvs(job_id):
-    ret = recommend_cvs(job_id, k = 50)
+    ret = adaptive_funneling(job_id, n=1, k=50)
     
     #handle case where no candidates are found
     if not ret:
         return None, 0.0
 
-    max_pt = -100 #start lower than 0 in case of penalties
-    winner = None # initialize variable safely
-    
-    for element in ret:
-        cos_sim = element[1]
-        cv_id = element[0]
-        final_score = compute_final_score(cos_sim, job_id, cv_id)
-        
-        if final_score > max_pt:
-            max_pt = final_score
-            winner = cv_id
-            
-    return winner, max_pt
+    return ret[0]
 
 # JOB POSTING EVALUATION
 
 def funneling_postings(cv_id):
-    ret = recommend_jobs(cv_id, k = 50)
+    ret = adaptive_funneling(cv_id, n=1, k=50, from_job_to_cv=False)
 
     #handle case where no jobs are found
     if not ret:
         return None, 0.0
         
-    max_pt = -100
-    winner = None
-    
-    for element in ret:
-        cos_sim = element[1]
-        job_id = element[0]
-        final_score = compute_final_score(cos_sim, job_id, cv_id, False)
-        
-        if final_score > max_pt:
-            max_pt = final_score
-            winner = job_id
-            
-    return winner, max_pt
+    return ret[0]
 
 # return all candidates ranked, not just the winner
 
@@ -90,14 +164,8 @@ def funneling_cvs_ranked(job_id, k=50):
     if not ret:
         return []
 
-    scored = []
-    for cv_id, cos_sim in ret:
-        final_score = compute_final_score(cos_sim, job_id, cv_id)
-        scored.append((cv_id, final_score))
-
-    #sort by score descending
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored
+    cv_ids, cos_sims = zip(*ret)
+    return rerank_batch(job_id, cv_ids, cos_sims)
 
 
 def funneling_postings_ranked(cv_id, k=50):
@@ -107,14 +175,8 @@ def funneling_postings_ranked(cv_id, k=50):
     if not ret:
         return []
 
-    scored = []
-    for job_id, cos_sim in ret:
-        final_score = compute_final_score(cos_sim, job_id, cv_id, from_job_to_cv=False)
-        scored.append((job_id, final_score))
-
-    #sort by score descending
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored
+    job_ids, cos_sims = zip(*ret)
+    return rerank_batch(cv_id, job_ids, cos_sims, from_job_to_cv=False)
 
 
 if __name__ == "__main__":
@@ -2,41 +2,53 @@ from scores.cosine_distance import recommend_cvs
 
 # FOR CV RETRIEVAL
 
-import pandas as pd
+import numpy as np
 
-from data_loader import load_job_metadata_pandas
+from scores.feature_lookup import get_lookup
 
-cv_df = pd.read_json("extraction/full_resume_dataset.json")
-cv_df = cv_df[["resume_id", "skill_ids"]]
-
-job_df = load_job_metadata_pandas()
-
-#we must ensure skill_ids is a list (parquet might load it as array)!!!!!
+#skill_ids are normalised to lists (parquet might load them as arrays) by the lookup
 
 def jaccard_similarity(job_id, cv_id):
     #retrieve skills for specific IDs
-    job_skills = job_df[job_df["job_id"] == job_id]["skill_ids"].values[0]
-    cv_skills = cv_df[cv_df["resume_id"] == cv_id]["skill_ids"].values[0]
-    
-    #convert to sets and handle cases where skills might be none/empty
-    if job_skills is None: job_skills = []
-    if cv_skills is None: cv_skills = []
-    
-    job_skills = set(list(job_skills))
-    cv_skills = set(list(cv_skills))
+    lookup = get_lookup()
+    job_skills = set(lookup.job_skill_ids(job_id))
+    cv_skills = set(lookup.cv_skill_ids(cv_id))
     
     return compute_jaccard(job_skills, cv_skills)
 
 def compute_jaccard(setA, setB):
-    if len(setA.union(setB)) == 0: return 0.0
     int_c = len(setA.intersection(setB))
-    un_c = len(setA.union(setB))
+    un_c = len(setA) + len(setB) - int_c
+    if un_c == 0: return 0.0
     return round(int_c/un_c, 4)
 
+# BATCH SCORING: one anchor against its whole candidate list
+
+def _batch_jaccard(anchor_m, anchor_sizes, anchor_row, cand_m, cand_sizes, cand_rows):
+    #|A n B| for every candidate with a single sparse matrix-vector product
+    inter = np.asarray((cand_m[cand_rows] @ anchor_m[anchor_row].T).todense()).ravel()
+    union = cand_sizes[cand_rows] + anchor_sizes[anchor_row] - inter
+    scores = np.divide(inter, union, out=np.zeros(len(cand_rows)), where=union > 0)
+    return np.round(scores, 4)
+
+def jaccard_batch(job_id, cv_ids):
+    #jaccard of one job against many cvs, same values as jaccard_similarity
+    lookup = get_lookup()
+    job_m, cv_m, job_sizes, cv_sizes = lookup.skill_matrices()
+    cv_rows = np.array([lookup.cv_row[cv_id] for cv_id in cv_ids], dtype=np.int64)
+    return _batch_jaccard(job_m, job_sizes, lookup.job_row[job_id], cv_m, cv_sizes, cv_rows)
+
+def jaccard_batch_jobs(cv_id, job_ids):
+    #jaccard of one cv against many jobs
+    lookup = get_lookup()
+    job_m, cv_m, job_sizes, cv_sizes = lookup.skill_matrices()
+    job_rows = np.array([lookup.job_row[job_id] for job_id in job_ids], dtype=np.int64)
+    return _batch_jaccard(cv_m, cv_sizes, lookup.cv_row[cv_id], job_m, job_sizes, job_rows)
+
 if __name__ == "__main__":
     
     #dynamically pick a valid ID
-    valid_job_id = job_df["job_id"].iloc[0]
+    valid_job_id = get_lookup().job_ids[0]
     
     print(f"Testing with Job ID: {valid_job_id}")
     print(jaccard_similarity(valid_job_id, "A1"))
@@ -0,0 +1,91 @@
+import functools
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#resolved from the project root: the consumer runs from its own folder
+OCCUPATIONS_CSV = os.path.join(PROJECT_ROOT, "extraction", "occupations_en.csv")
+#compact artifact rebuilt only when the csv's hash changes
+OCCUPATIONS_CACHE = os.path.join(PROJECT_ROOT, "extraction", "occupations_en.pkl")
+CACHE_VERSION = 2
+
+
+def normalize_label(label):
+    return " ".join(str(label).lower().split())
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_label_index(occupation_diz):
+    #inverted index: normalized label -> preferred labels of the occupation groups containing it
+    #(labels, not positions: the groups stored by the feature store survive a rebuild of the index)
+    index = dict()
+    for preferred, labels in occupation_diz.items():
+        for label in labels:
+            index.setdefault(normalize_label(label), set()).add(preferred)
+    return {label: frozenset(groups) for label, groups in index.items()}
+
+def build_occupations(csv_path=OCCUPATIONS_CSV):
+    occupations = pd.read_csv(csv_path, usecols=["preferredLabel", "altLabels"])
+    occupation_diz = dict()
+
+    # occupation dictionary creation
+
+    for key, values in occupations.itertuples(index=False, name=None):
+        if isinstance(values, str): #safety check
+            values = values.split("\n")
+        else:
+            values = []
+        values.append(key)
+        values = list(set(values))
+        occupation_diz[key] = values
+
+    occupation_groups = list(occupation_diz.values())
+    return {
+        "occupation_diz": occupation_diz,
+        "occupation_groups": occupation_groups,
+        "label_groups": build_label_index(occupation_diz),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def load_occupations(csv_path=OCCUPATIONS_CSV, cache_path=OCCUPATIONS_CACHE):
+    #loaded on first use: importing the scores modules no longer parses the csv
+    csv_hash = file_hash(csv_path)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") == CACHE_VERSION and cached.get("csv_hash") == csv_hash:
+                return cached["data"]
+        except (pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+            pass #corrupted or stale artifact, rebuilt below
+
+    data = build_occupations(csv_path)
+    #write then rename, so a concurrent worker never reads a half-written file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": CACHE_VERSION, "csv_hash": csv_hash, "data": data}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return data
+
+
+NO_GROUPS = frozenset()
+
+def groups_of(title):
+    return load_occupations()["label_groups"].get(normalize_label(title), NO_GROUPS)
+
+
+if __name__ == "__main__":
+    occupations = load_occupations()
+    print(f"{len(occupations['occupation_groups'])} occupation groups, "
+          f"{len(occupations['label_groups'])} labels, cached in {OCCUPATIONS_CACHE}")
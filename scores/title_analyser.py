@@ -1,66 +1,110 @@
-import pandas as pd
+import functools
+
+import numpy as np
 from py_stringmatching import PartialRatio
-from data_loader import load_job_metadata_pandas
+from scores.feature_lookup import get_lookup
+from scores.occupation_index import normalize_label
 
+TITLE_PAIR_CACHE_SIZE = 200_000
 
-occupations = pd.read_csv("extraction/occupations_en.csv")
-occupations = occupations[["preferredLabel", "altLabels", "definition", "description"]]
-occupation_diz = dict()
 
+def _category(job_title, cv_titles):
+    lookup = get_lookup()
+    job_groups = lookup.title_groups(job_title)
+    pt=0
+    for el in cv_titles:
+        if el == job_title:
+            return 1
+        else:
+            #number of groups containing both titles
+            pt += len(lookup.title_groups(el) & job_groups)
+    return round(pt,4)
 
-# occupation dictionary creation
+def title_category(job_id, cv_id):
+    lookup = get_lookup()
+    return _category(lookup.job_title(job_id), lookup.cv_title_list(cv_id))
 
-for i in range(len(occupations)):
-    key = occupations.loc[i]["preferredLabel"]
-    values = occupations.loc[i]["altLabels"]
-    if isinstance(values, str): #safety check
-        values = values.split("\n")
-    else:
-        values = []
-    values.append(key)
-    values = list(set(values))
-    occupation_diz[key] = values
+def title_category_batch(job_id, cv_ids):
+    lookup = get_lookup()
+    job_title = lookup.job_title(job_id)
+    return np.array([_category(job_title, lookup.cv_title_list(cv_id)) for cv_id in cv_ids], dtype=np.float64)
 
+def title_category_batch_jobs(cv_id, job_ids):
+    lookup = get_lookup()
+    cv_titles = lookup.cv_title_list(cv_id)
+    return np.array([_category(lookup.job_title(job_id), cv_titles) for job_id in job_ids], dtype=np.float64)
 
-cv_df = pd.read_json("extraction/full_resume_dataset.json")
-cv_df = cv_df[["resume_id", "titles"]]
+# UPPER BOUNDS of title_category, used by the adaptive funnel to stop early
 
+@functools.lru_cache(maxsize=None)
+def _max_cv_titles():
+    return max((len(titles) for titles in get_lookup().cv_titles), default=0)
 
-job_df = load_job_metadata_pandas()
+def title_category_bound(job_id):
+    #any cv: an exact match gives 1, otherwise each cv title adds at most every group of the job title
+    lookup = get_lookup()
+    return max(1, len(lookup.title_groups(lookup.job_title(job_id))) * _max_cv_titles())
 
+def title_category_bound_jobs(cv_id):
+    #any job: each cv title adds at most the number of its own groups
+    lookup = get_lookup()
+    return max(1, sum(len(lookup.title_groups(title)) for title in lookup.cv_title_list(cv_id)))
 
-occupation_groups = list(occupation_diz.values())
 
-def title_category(job_id, cv_id):
-    job_title = job_df[job_df["job_id"]== job_id]["title"].values[0]
-    cv_titles = cv_df[cv_df["resume_id"] == cv_id]["titles"].values[0]
-    pt=0
-    for el in cv_titles:
-        if el == job_title:
-            return 1
-        else:
-            for i in range(len(occupation_groups)):
-                if el in occupation_groups[i] and job_title in occupation_groups[i]:
-                    pt +=1
-    return round(pt,4)
+# TITLE SIMILARITY: interned titles and a bounded cache of pairwise scores
 
+_matcher = PartialRatio()
+_title_ids = dict()
+_titles = []
 
-def title_similarity(job_id, cv_id):
-    s = PartialRatio()
-    job_title = job_df[job_df["job_id"]== job_id]["title"].values[0]
-    cv_titles = cv_df[cv_df["resume_id"] == cv_id]["titles"].values[0]
+def intern_title(title):
+    #normalized title -> small integer, so equal titles share one cache entry
+    norm = normalize_label(title)
+    title_id = _title_ids.get(norm)
+    if title_id is None:
+        title_id = _title_ids[norm] = len(_titles)
+        _titles.append(norm)
+    return title_id
+
+@functools.lru_cache(maxsize=TITLE_PAIR_CACHE_SIZE)
+def _pair_score(title_id_a, title_id_b):
+    return _matcher.get_raw_score(_titles[title_id_a], _titles[title_id_b])/100
+
+def pair_score(title_a, title_b):
+    a, b = intern_title(title_a), intern_title(title_b)
+    #partial ratio is symmetric: one entry per unordered pair
+    return _pair_score(min(a, b), max(a, b))
+
+def _best_score(job_title, cv_titles):
     pt = 0
     for title in cv_titles:
-        score = s.get_raw_score(title, job_title)/100
-        pt = max(pt, score)
+        pt = max(pt, pair_score(title, job_title))
     return pt
+
+def title_similarity(job_id, cv_id):
+    lookup = get_lookup()
+    job_title = lookup.job_title(job_id)
+    cv_titles = lookup.cv_title_list(cv_id)
+    return _best_score(job_title, cv_titles)
+
+def title_similarity_batch(job_id, cv_ids):
+    #one job title against the titles of many cvs
+    lookup = get_lookup()
+    job_title = lookup.job_title(job_id)
+    return np.array([_best_score(job_title, lookup.cv_title_list(cv_id)) for cv_id in cv_ids], dtype=np.float64)
+
+def title_similarity_batch_jobs(cv_id, job_ids):
+    #the titles of one cv against the title of many jobs
+    lookup = get_lookup()
+    cv_titles = lookup.cv_title_list(cv_id)
+    return np.array([_best_score(lookup.job_title(job_id), cv_titles) for job_id in job_ids], dtype=np.float64)
      
 
 
 if __name__ == "__main__":
 
     #dynamically pick a valid ID
-    valid_job_id = job_df["job_id"].iloc[0]
+    valid_job_id = get_lookup().job_ids[0]
     
     print(f"Testing with Job ID: {valid_job_id}")
     print(title_category(valid_job_id, "A1"))
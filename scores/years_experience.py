@@ -1,24 +1,28 @@
-import pandas as pd
-import math
-from data_loader import load_job_metadata_pandas
+import numpy as np
+
+from ingest_cv.cv_processing.cv_formatting import SENIORITY_LEVELS, UNKNOWN_LEVEL
+from scores.feature_lookup import get_lookup
 
 QUALIF_PENALTY = - 0.15
 QUALIF_PRIZE = 0.05
+#levels are integers from cv_formatting's bucketing (1 internship ... 5 principal)
+MAX_LEVEL_GAP = max(SENIORITY_LEVELS.values()) - min(SENIORITY_LEVELS.values())
 
-def experience_computer(one_job, one_cv):
+def level_gap(job_levels, cv_levels):
     # it's slightly better if skills exceed requirements min(3)
     # it's much worse if skills exceed requirements (max (3))
-    diz = {1: "internship level", 2: "junior level", 3: "mid-level", 4:"senior level"}
-    maximum = (max(diz.keys()) - min(diz.keys()))
-    for key in diz.keys():
-        if diz[key] in one_job.lower():
-            for other_key in diz.keys():
-                if other_key in one_cv.lower():
-                    diff = other_key - key
-                    return max(0,diff)*QUALIF_PRIZE/maximum - min(0,diff)*QUALIF_PENALTY/maximum
-                
+    # vectorized over candidate arrays, 0 where either seniority is unknown
+    job_levels = np.asarray(job_levels, dtype=np.int64)
+    cv_levels = np.asarray(cv_levels, dtype=np.int64)
+    diff = cv_levels - job_levels
+    gap = np.maximum(0, diff)*QUALIF_PRIZE/MAX_LEVEL_GAP - np.minimum(0, diff)*QUALIF_PENALTY/MAX_LEVEL_GAP
+    return np.where((job_levels == UNKNOWN_LEVEL) | (cv_levels == UNKNOWN_LEVEL), 0.0, gap)
 
-    
-
-    
-    
\ No newline at end of file
+def experience_computer(one_job, one_cv):
+    #job id and cv id; None when the seniority of either is unknown
+    lookup = get_lookup()
+    job_level = lookup.job_levels([one_job])[0]
+    cv_level = lookup.cv_levels([one_cv])[0]
+    if job_level == UNKNOWN_LEVEL or cv_level == UNKNOWN_LEVEL:
+        return None
+    return float(level_gap(job_level, cv_level))
@@ -0,0 +1,25 @@
+import types
+
+import numpy as np
+
+from scores import bulk_funnel
+
+
+def test_unknown_candidates_are_dropped_not_the_shortlist(monkeypatch):
+    lookup = types.SimpleNamespace(job_row={"B1": 0, "B2": 1}, cv_row={"A1": 0, "A3": 1})
+    monkeypatch.setattr(bulk_funnel, "get_lookup", lambda: lookup)
+
+    def rerank_batch(anchor_id, candidate_ids, cosine_scores, n=None, from_job_to_cv=True):
+        # the real scores raise KeyError on an id missing from the feature tables
+        for candidate_id in candidate_ids:
+            lookup.cv_row[candidate_id]
+        order = np.argsort(-np.asarray(cosine_scores), kind="stable")
+        return [(candidate_ids[i], float(cosine_scores[i])) for i in order][:n]
+    monkeypatch.setattr(bulk_funnel, "rerank_batch", rerank_batch)
+
+    chunk = [("B1", ["A1", "A2", "A3"], np.array([0.9, 0.8, 0.7])),
+             ("B9", ["A1"], np.array([0.5]))]
+    rows, missing_anchors, missing_candidates = bulk_funnel._rerank_chunk((True, None, chunk))
+    assert rows == [("B1", 1, "A1", 0.9), ("B1", 2, "A3", 0.7)]
+    assert missing_anchors == {"B9"}
+    assert missing_candidates == {"A2"}
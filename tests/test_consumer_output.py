@@ -0,0 +1,29 @@
+import os
+
+from cv_spark_consumer import publish_staged
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_staged_parts_of_two_writers_land_in_the_shared_folder(tmp_path):
+    output = tmp_path / "schema_cv"
+    for writer, part in (("consumer_0", "part-00000-aaa.c000.snappy.parquet"),
+                         ("consumer_1", "part-00000-bbb.c000.snappy.parquet")):
+        staging = tmp_path / "_staging" / writer / "schema_cv"
+        _touch(str(staging / "id=A1" / part))
+        _touch(str(staging / "id=A1" / f".{part}.crc"))
+        _touch(str(staging / "_SUCCESS"))
+        publish_staged(str(staging), str(output))
+        assert not (staging / "_SUCCESS").exists()
+    assert sorted(os.listdir(output / "id=A1")) == ["part-00000-aaa.c000.snappy.parquet",
+                                                    "part-00000-bbb.c000.snappy.parquet"]
+
+
+def test_uncommitted_write_is_not_published(tmp_path):
+    staging = tmp_path / "_staging" / "consumer_0" / "text_cv"
+    _touch(str(staging / "id=A1" / "part-00000-aaa.c000.snappy.parquet"))
+    publish_staged(str(staging), str(tmp_path / "text_cv"))
+    assert not (tmp_path / "text_cv").exists()
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from cv_spark_ingestion import deduplicate
+
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+    session = SparkSession.builder.master("local[2]").appName("test_dedup") \
+        .config("spark.sql.shuffle.partitions", "2").getOrCreate()
+    yield session
+    session.stop()
+
+
+def _write_batch(folder, name, rows):
+    with open(os.path.join(folder, name), "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def test_lagging_topic_is_not_dropped_as_late(spark, tmp_path):
+    # raw_jobs is read first with recent Kafka timestamps, raw_resumes lags days behind:
+    # a watermark on the Kafka timestamp would drop every resume as late
+    source, checkpoint = tmp_path / "source", tmp_path / "checkpoint"
+    source.mkdir()
+    stream = spark.readStream.schema("id STRING, topic STRING, content_hash STRING, kafka_ts TIMESTAMP") \
+        .option("maxFilesPerTrigger", 1).json(str(source))
+    query = deduplicate(stream, "1 hour").writeStream.format("memory").queryName("dedup_out") \
+        .option("checkpointLocation", str(checkpoint)).start()
+    try:
+        _write_batch(source, "1.json", [
+            {"id": "B1", "topic": "raw_jobs", "content_hash": "h1", "kafka_ts": "2030-01-02 00:00:00"},
+            {"id": "B2", "topic": "raw_jobs", "content_hash": "h2", "kafka_ts": "2030-01-02 00:05:00"},
+        ])
+        query.processAllAvailable()
+        _write_batch(source, "2.json", [
+            {"id": "A1", "topic": "raw_resumes", "content_hash": "h3", "kafka_ts": "2029-12-25 00:00:00"},
+            {"id": "A2", "topic": "raw_resumes", "content_hash": "h4", "kafka_ts": "2029-12-20 00:00:00"},
+            # same content as B1, sent again through the other topic
+            {"id": "A3", "topic": "raw_resumes", "content_hash": "h1", "kafka_ts": "2029-12-20 00:00:00"},
+        ])
+        query.processAllAvailable()
+    finally:
+        query.stop()
+
+    ids = sorted(row.id for row in spark.sql("SELECT id FROM dedup_out").collect())
+    assert ids == ["A1", "A2", "B1", "B2"]
@@ -0,0 +1,12 @@
+from cv_processing.document_router import select_parser
+
+
+def test_null_fields_select_no_parser():
+    # from_json gives all-null fields for a malformed Kafka payload
+    assert select_parser(None, None, None) is None
+
+
+def test_null_type_still_routes_by_source():
+    assert select_parser("new_texts", None) == "nlp"
+    assert select_parser("string_dataset", None) == "dataset"
+    assert select_parser(None, None, "job") == "job"
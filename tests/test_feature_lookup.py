@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from scores.feature_lookup import FeatureLookup, with_store_features
+from scores.occupation_index import build_label_index
+
+
+def _frame(ids, skills, titles, groups, seniority):
+    return pd.DataFrame({"id": ids, "skill_ids": skills, "titles": titles,
+                         "title_groups": groups, "seniority": np.array(seniority)})
+
+
+def test_store_rows_keep_the_skills_of_the_datasets():
+    dataset = _frame(["A1", "A2"], [[1, 2], [3]], [["dev"], ["x"]], [[], []], [0, 0])
+    store = _frame(["A2", "A9"], [["python"], ["go"]], [["data engineer"], ["y"]],
+                   [[["Data Engineer"]], [[]]], [4, 2])
+    merged = with_store_features(dataset, store, "cv")
+    assert merged["id"].tolist() == ["A1", "A2"]
+    assert merged["skill_ids"].tolist() == [[1, 2], [3]]
+    assert merged["titles"].tolist() == [["dev"], ["data engineer"]]
+    assert merged["seniority"].tolist() == [0, 4]
+
+
+def test_title_groups_are_occupation_labels():
+    index = build_label_index({"Data Engineer": ["data engineer", "DE"], "Developer": ["DE"]})
+    assert index["de"] == frozenset({"Data Engineer", "Developer"})
+
+    features = _frame(["B1"], [[1]], [["data engineer", "old title"]],
+                      [[["Data Engineer"], [7]]], [4])
+    lookup = FeatureLookup.from_feature_store(features, features.assign(id=["A1"]))
+    # groups stored as positions by an older index are not trusted
+    assert lookup.title_group_map == {"data engineer": frozenset({"Data Engineer"})}
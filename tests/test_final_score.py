@@ -0,0 +1,31 @@
+import numpy as np
+
+from scores import final_score
+
+
+def _stable_top(ids, scores, n):
+    order = np.argsort(-scores, kind="stable")[:n]
+    return [(ids[i], float(scores[i])) for i in order]
+
+
+def test_ties_at_the_cutoff_keep_the_candidate_order():
+    ids = ["A1", "A2", "A3", "A4", "A5", "A6"]
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1, 0.5])
+    assert final_score.top_n(ids, scores, 3) == [("A2", 0.9), ("A1", 0.5), ("A3", 0.5)]
+
+
+def test_matches_a_stable_full_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        size = int(rng.integers(1, 30))
+        # few distinct values: ties at the cutoff in most cases
+        scores = rng.integers(0, 5, size) / 4
+        ids = [f"A{i}" for i in range(size)]
+        n = int(rng.integers(1, size + 1))
+        assert final_score.top_n(ids, scores, n) == _stable_top(ids, scores, n)
+
+
+def test_without_n_every_candidate_is_ranked():
+    ids = ["B1", "B2", "B3"]
+    scores = np.array([0.2, 0.2, 0.7])
+    assert final_score.top_n(ids, scores) == [("B3", 0.7), ("B1", 0.2), ("B2", 0.2)]
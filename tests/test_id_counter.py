@@ -0,0 +1,25 @@
+import multiprocessing
+
+from cv_spark_producer import IdBlocks, reserve_ids
+
+
+def _reserve(args):
+    state_file, count = args
+    return [reserve_ids(state_file) for _ in range(count)]
+
+
+def test_processes_never_share_an_id(tmp_path):
+    state_file = str(tmp_path / "id_counter_resumes.txt")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        ids = [i for chunk in pool.map(_reserve, [(state_file, 50)] * 4) for i in chunk]
+    assert sorted(ids) == list(range(1, 201))
+
+
+def test_blocks_skip_the_ids_reserved_by_others(tmp_path):
+    state_file = str(tmp_path / "id_counter_jobs.txt")
+    blocks = IdBlocks(state_file, block=3)
+    taken = [blocks.take(), blocks.take()]
+    service_id = reserve_ids(state_file)
+    taken += [blocks.take(), blocks.take()]
+    assert taken == [1, 2, 3, 5]
+    assert service_id == 4
@@ -0,0 +1,35 @@
+import json
+import time
+
+from local_runner import kafka_payloads
+
+
+class _Message:
+    def __init__(self, doc_id):
+        self.doc_id = doc_id
+
+    def error(self):
+        return None
+
+    def value(self):
+        return json.dumps({"id": self.doc_id}).encode("utf-8")
+
+
+class _Consumer:
+    def __init__(self, count):
+        self.queue = [_Message(f"A{i}") for i in range(count)]
+
+    def poll(self, timeout):
+        if self.queue:
+            return self.queue.pop(0)
+        time.sleep(0.01)
+        return None
+
+
+def test_parsing_a_batch_does_not_count_as_idle():
+    ids = []
+    for payload in kafka_payloads(_Consumer(6), idle_timeout=0.2):
+        ids.append(payload["id"])
+        if len(ids) % 3 == 0:
+            time.sleep(0.5)     # a batch parsed for longer than the idle timeout
+    assert ids == [f"A{i}" for i in range(6)]
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import urllib.request
+
+import numpy as np
+import pytest
+
+import matching_service as ms
+
+
+class _Model:
+    """Encodes the prefix into the vector: a query and a passage of the same text differ."""
+
+    def encode(self, texts, truncate_dim=None, convert_to_numpy=True):
+        return np.array([[1.0, 0.0] if t.startswith("Query: ") else [0.0, 1.0] for t in texts],
+                        dtype="float32")
+
+
+class _Index:
+    """Inner-product index with ids, as faiss.IndexIDMap(IndexFlatIP)."""
+
+    def __init__(self, matrix, ids):
+        self.matrix = np.asarray(matrix, dtype="float32")
+        self.ids = np.asarray(ids, dtype="int64")
+
+    def add_with_ids(self, matrix, ids):
+        self.matrix = np.vstack([self.matrix, matrix])
+        self.ids = np.concatenate([self.ids, ids])
+
+    def search(self, queries, k):
+        scores = queries @ self.matrix.T
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, axis=1), self.ids[order]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(ms, "build_index", _Index)
+    service = ms.MatchingService.__new__(ms.MatchingService)
+    service.model = _Model()
+    service.stores = ms.STORES
+    service.lock = threading.Lock()
+    # A1 is stored as a cv query, B1 as a job passage, as ingest() would encode them
+    service.embeddings = {"cv": {"A1": np.array([1.0, 0.0], dtype="float32")},
+                          "job": {"B1": np.array([0.0, 1.0], dtype="float32")}}
+    service.texts = {"cv": {"A1": "Query: cv"}, "job": {"B1": "Passage: job"}}
+    service.schemas = {"cv": {}, "job": {}}
+    service.indexes = {"cv": _Index([[1.0, 0.0]], [1]), "job": _Index([[0.0, 1.0]], [1])}
+    return service
+
+
+@pytest.fixture
+def base_url(service):
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = dict()
+
+    async def start():
+        server = await asyncio.start_server(
+            lambda r, w: ms._handle_client(service, r, w), "127.0.0.1", 0)
+        state["server"] = server
+        state["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(start()), loop.run_forever()),
+                              daemon=True)
+    thread.start()
+    started.wait(5)
+    yield f"http://127.0.0.1:{state['port']}"
+    loop.call_soon_threadsafe(state["server"].close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_cv_text_is_a_query_matched_against_jobs(base_url):
+    result = _post(f"{base_url}/match", {"text": "cv", "category": "cv", "k": 1})
+    assert result["anchor"] == "Query: cv"
+    assert [m["match_id"] for m in result["matches"]] == ["B1"]
+
+
+def test_job_text_is_a_passage_matched_against_cvs(base_url):
+    result = _post(f"{base_url}/match", {"text": "job", "category": "job", "k": 1})
+    assert result["anchor"] == "Passage: job"
+    assert [m["match_id"] for m in result["matches"]] == ["A1"]
@@ -0,0 +1,31 @@
+import pytest
+
+from cv_spark_ingestion import STALL_MARGIN, Lane, StallWatch
+
+
+def _progress(batch_id, rows, ms):
+    return {"batchId": batch_id, "numInputRows": rows, "durationMs": {"triggerExecution": ms}}
+
+
+def test_limit_is_the_lane_setting_before_any_batch():
+    watch = StallWatch([Lane("slow", "10 seconds", weight=1, min_share=0, max_offsets=200, stall_seconds=900.0)])
+    assert watch.limit("slow") == 900.0
+
+
+def test_limit_grows_with_batch_size_and_time_per_record():
+    lane = Lane("slow", "10 seconds", weight=1, min_share=0, max_offsets=1000, stall_seconds=300.0)
+    watch = StallWatch([lane])
+    watch.observe("slow", _progress(0, 100, 60_000))    # 0.6s per CV
+    assert watch.limit("slow") == pytest.approx(STALL_MARGIN * 1000 * 0.6)
+
+    watch.started(lane, 100)    # adaptive rate lowered the limit
+    assert watch.limit("slow") == 300.0
+
+
+def test_unlimited_lane_uses_largest_batch_seen():
+    watch = StallWatch([Lane("all", "10 seconds", weight=1, min_share=0, max_offsets=0, stall_seconds=10.0)])
+    watch.observe("all", _progress(0, 50, 5_000))
+    watch.observe("all", _progress(1, 20, 2_000))
+    watch.observe("all", _progress(1, 20, 2_000))   # same progress polled again
+    watch.observe("all", _progress(2, 0, 100))      # idle trigger
+    assert watch.limit("all") == pytest.approx(STALL_MARGIN * 50 * 0.1)